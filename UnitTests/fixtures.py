@@ -0,0 +1,106 @@
+"""Pages, trips and fake sessions shared by the unit tests."""
+import re
+from datetime import date, datetime, timedelta
+
+from trip_classes import Trip, TripType
+
+BASE_URL = "https://traintimes.org.uk"
+
+RESULTS_PAGE = """
+<html><body>
+<ul>
+  <li id="result0">
+    <strong>10:34 &ndash; 12:41</strong>
+    <small>2h 7m, <a class="calling_link" href="/calling/1">calling points</a> &pound;25.50 Advance Single</small>
+  </li>
+  <li id="result1">
+    <strong>11:34 &ndash; 13:50</strong>
+    <small>2h 16m, <a class="calling_link other" href="/calling/2">calling points</a> &pound;80.10 Single</small>
+  </li>
+  <li id="result2">
+    <strong>12:04 &ndash; 14:41</strong>
+    <small>2h 37m, <a class="change_link" href="/change/3">1 change</a> &pound;19.00 Advance Single</small>
+  </li>
+  <li id="result3">
+    <strong>13:04 &ndash; 15:11</strong>
+    <small>2h 7m</small>
+  </li>
+  <li id="resultsummary"><small>not a result</small></li>
+</ul>
+<a data-type="out-earlier" href="/earlier">Earlier</a>
+</body></html>
+"""
+
+
+def make_trip(cost, trip_type=TripType.OUTBOUND, minutes=127, stops=3, departure="10:34 – 12:41",
+              travel_date=date(2026, 11, 3)):
+    return Trip(type=trip_type, cost=cost, departure_arrival=departure,
+                travel_time_str=f"{minutes // 60}h {minutes % 60}m", travel_time_minutes=minutes,
+                date=travel_date.strftime("%B %d, %Y"), num_stops=stops)
+
+
+def results_page(departures, later=None, earlier=None, too_far=False):
+    """A results page listing (departure – arrival, cost, calling points path) direct trains."""
+    items = "".join(f"""
+  <li id="result{index}">
+    <strong>{departure_arrival.replace(' – ', ' &ndash; ')}</strong>
+    <small>1h 0m, <a class="calling_link" href="{calling}">calling points</a> &pound;{cost:.2f} Advance Single</small>
+  </li>""" for index, (departure_arrival, cost, calling) in enumerate(departures))
+    links = "".join(f'<a data-type="{data_type}" href="{href}">link</a>'
+                    for data_type, href in (('out-later', later), ('out-earlier', earlier)) if href)
+    error = '<p class="error-message">Too far in advance</p>' if too_far else ''
+    return f"<html><body>{error}<ul>{items}</ul>{links}</body></html>"
+
+# result3 has no price yet, its date would be too far in advance
+PRICED_PAGE = re.sub(r'<li id="result3">.*?</li>', '', RESULTS_PAGE, flags=re.S)
+CALLING_PAGE = "<table><tbody><tr><td>a</td></tr><tr><td>b</td></tr><tr><td>c</td></tr></tbody></table>"
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.status_code = 200
+        self.headers = {}
+        self.text = text
+        self.content = text.encode('utf-8')
+
+
+class SiteSession:
+    """Answers the url in ``pages`` with its page and any other results page with the same one, and records
+    the requests.
+    """
+
+    def __init__(self, pages=None):
+        self.cookies = {'session': 'abc'}
+        self.page = PRICED_PAGE
+        self.pages = pages or {}
+        self.urls = []
+
+    @property
+    def requests(self):
+        return len(self.urls)
+
+    def request(self, method, url, **kwargs):
+        self.urls.append(url)
+        if url in self.pages:
+            return FakeResponse(self.pages[url])
+        return FakeResponse(CALLING_PAGE if '/calling/' in url else self.page)
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+def month_after_next():
+    """First day of a month whose dates are all in the future."""
+    today = date.today()
+    year, month = divmod(today.year * 12 + today.month + 1, 12)
+    return datetime(year, month + 1, 1)
+
+
+def weekdays_of(month_start, weekday):
+    """Dates of a weekday (0 is Monday) in the month starting on month_start."""
+    day = month_start.date() + timedelta(days=(weekday - month_start.weekday()) % 7)
+    dates = []
+    while day.month == month_start.month:
+        dates.append(day)
+        day += timedelta(days=7)
+    return dates
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+
+from fixtures import month_after_next
+from train_ticket_finder import TrainTicketFinder
+
+
+class PrimedSession:
+    """A session that already has its cookies, so the finder sends no request when it is created."""
+
+    def __init__(self):
+        self.cookies = {'session': 'abc'}
+
+    def request(self, method, url, **kwargs):
+        raise AssertionError(f"Unexpected request {method} {url}")
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+# every date searched is in the future, whenever the tests run
+START = month_after_next()
+
+
+class HorizonFinder(TrainTicketFinder):
+    """Every date up to ``horizon`` is bookable, the probes are recorded instead of sent."""
+
+    horizon = START.date() + timedelta(days=73)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.probes = []
+
+    def _is_bookable(self, trip_date):
+        self.probes.append(trip_date)
+        return trip_date <= self.horizon
+
+
+class TestBookingHorizon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        # cleanups run last in first out, so the caches are closed before the directory goes
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.dates = [START.date() + timedelta(days=2 + day) for day in range(180)]
+
+    def finder(self):
+        finder = HorizonFinder(START, session=PrimedSession(), months=6,
+                               cache_path=os.path.join(self.tmp_dir.name, 'cache.sqlite3'))
+        self.addCleanup(finder.cache.close)
+        return finder
+
+    def test_binary_search_finds_last_bookable_date(self):
+        finder = self.finder()
+        self.assertEqual(finder.find_booking_horizon(self.dates), HorizonFinder.horizon)
+        self.assertLessEqual(len(finder.probes), 8)
+
+    def test_horizon_is_cached_per_route(self):
+        self.finder().find_booking_horizon(self.dates)
+        finder = self.finder()
+        self.assertEqual(finder.find_booking_horizon(self.dates), HorizonFinder.horizon)
+        self.assertEqual(finder.probes, [])
+
+    def test_cached_horizon_still_expires(self):
+        first = self.finder()
+        first.find_booking_horizon(self.dates)
+        cache_key = first._horizon_cache_key()
+        # found 20 hours ago, then the site opened 10 more days
+        first.cache.put(cache_key, first.cache.get(cache_key), stored_at=time.time() - 20 * 60 * 60, force=True)
+        first.cache.commit()
+        first.horizon = HorizonFinder.horizon + timedelta(days=10)
+
+        second = self.finder()
+        second.horizon = first.horizon
+        self.assertEqual(second.find_booking_horizon(self.dates), HorizonFinder.horizon)
+        self.assertEqual(second.probes, [])
+        # answering from the cache doesn't push its expiry out, it still expires 4 hours from now
+        self.assertIsNone(second.cache.get(cache_key, fresh_for=5 * 60 * 60))
+
+        # once it has expired the search runs again and finds the new horizon
+        second.cache.put(cache_key, second.cache.get(cache_key), stored_at=time.time() - 25 * 60 * 60, force=True)
+        second.cache.commit()
+        third = self.finder()
+        third.horizon = first.horizon
+        self.assertEqual(third.find_booking_horizon(self.dates), first.horizon)
+        self.assertTrue(third.probes)
+
+    def test_no_bookable_date(self):
+        finder = self.finder()
+        self.assertIsNone(finder.find_booking_horizon([HorizonFinder.horizon + timedelta(days=days) for days in (19, 20)]))
+
+    def test_only_bookable_date_pairs_are_scheduled(self):
+        finder = self.finder()
+        date_pairs = finder._bookable_date_pairs()
+        self.assertTrue(date_pairs)
+        self.assertTrue(all(date2 <= HorizonFinder.horizon for _, date2 in date_pairs))
+        self.assertLess(len(date_pairs), len(finder.date_pairs))
+
+
+if __name__ == '__main__':
+    unittest.main()
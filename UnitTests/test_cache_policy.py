@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from cache_policy import CachePolicy, DAY, HOUR
+from cache_store import CacheStore
+
+
+class TestCachePolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = CachePolicy()
+        self.now = time.time()
+        self.today = datetime.fromtimestamp(self.now).date()
+
+    def _fare_key(self, days_ahead):
+        return f"{(self.today + timedelta(days=days_ahead)).isoformat()}_https://traintimes.org.uk/a/b/10:30a"
+
+    def test_fare_ttl_grows_with_days_ahead(self):
+        self.assertEqual(self.policy.ttl(self._fare_key(1), self.now), 1 * HOUR)
+        self.assertEqual(self.policy.ttl(self._fare_key(5), self.now), 3 * HOUR)
+        self.assertEqual(self.policy.ttl(self._fare_key(20), self.now), 12 * HOUR)
+        self.assertEqual(self.policy.ttl(self._fare_key(90), self.now), 2 * DAY)
+
+    def test_stops_and_other_keys(self):
+        self.assertEqual(self.policy.ttl("stops_https://traintimes.org.uk/x", self.now), 30 * DAY)
+        self.assertEqual(self.policy.ttl("horizon_a_b", self.now), 1 * DAY)
+        self.assertIsNone(self.policy.ttl("something_else", self.now))
+
+
+class TestCacheStoreEviction(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'cache.sqlite3')
+        self.today = datetime.now().date()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_expired_entries_are_misses_and_evicted(self):
+        cache = CacheStore(self.db_path, policy=CachePolicy(stops_ttl=-1))
+        cache["stops_url"] = 3
+        self.assertNotIn("stops_url", cache)
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_past_dates_are_evicted(self):
+        cache = CacheStore(self.db_path, policy=CachePolicy())
+        cache[f"{(self.today - timedelta(days=1)).isoformat()}_url"] = []
+        cache[f"{(self.today + timedelta(days=10)).isoformat()}_url"] = []
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_entries_above_limit_are_evicted(self):
+        cache = CacheStore(self.db_path, policy=CachePolicy(max_entries=2))
+        for index in range(3):
+            cache[f"stops_{index}"] = index
+            time.sleep(0.01)
+        cache.get("stops_0")
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(sorted(cache.keys()), ["stops_0", "stops_2"])
+
+
+if __name__ == '__main__':
+    unittest.main()
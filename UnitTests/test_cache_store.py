@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+
+from cache_store import CacheStore
+from trip_classes import Trip, TripType, TripJSONEncoder
+
+
+class TestCacheStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'cache.sqlite3')
+        self.trip = Trip(type=TripType.OUTBOUND, cost=25.5, departure_arrival="10:34 – 12:41",
+                         travel_time_str="2h 7m", travel_time_minutes=127, date="May 25, 2025", num_stops=3)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get_round_trip_trips(self):
+        cache = CacheStore(self.db_path)
+        cache["2025-05-25_url"] = [self.trip]
+        cache["stops_url"] = 3
+        cache.commit()
+        cache.close()
+
+        cache = CacheStore(self.db_path)
+        self.assertIn("2025-05-25_url", cache)
+        self.assertEqual(cache["2025-05-25_url"], [self.trip])
+        self.assertEqual(cache.get("stops_url"), 3)
+        self.assertNotIn("missing", cache)
+        with self.assertRaises(KeyError):
+            _ = cache["missing"]
+
+    def test_read_disabled_only_sees_keys_written_this_run(self):
+        cache = CacheStore(self.db_path)
+        cache["stops_old"] = 2
+        cache.close()
+
+        cache = CacheStore(self.db_path, read_enabled=False)
+        self.assertNotIn("stops_old", cache)
+        cache["stops_new"] = 4
+        self.assertEqual(cache["stops_new"], 4)
+
+    def test_prefetch_loads_present_keys_and_remembers_missing_ones(self):
+        cache = CacheStore(self.db_path)
+        cache["2025-05-25_url"] = [self.trip]
+        cache.close()
+
+        cache = CacheStore(self.db_path)
+        cache.prefetch(["2025-05-25_url", "2025-05-26_url"])
+        self.assertEqual(cache.get("2025-05-25_url"), [self.trip])
+        self.assertNotIn("2025-05-26_url", cache)
+        cache["2025-05-26_url"] = []
+        self.assertEqual(cache["2025-05-26_url"], [])
+
+    def test_concurrent_stores_share_entries(self):
+        first = CacheStore(self.db_path)
+        second = CacheStore(self.db_path)
+        self.assertIsNone(second.get("stops_url"))
+
+        first["stops_url"] = 3
+        first.commit()
+        self.assertEqual(second.reload("stops_url"), 3)
+        first.close()
+        second.close()
+
+    def test_older_data_does_not_overwrite_newer(self):
+        first = CacheStore(self.db_path)
+        second = CacheStore(self.db_path)
+        first.put("stops_url", 3, stored_at=200.0)
+        first.commit()
+        # fetched before the other process's entry, so it is dropped
+        self.assertFalse(second.put("stops_url", 5, stored_at=100.0))
+        second.commit()
+        self.assertEqual(second.get("stops_url"), 3)
+        self.assertTrue(second.put("stops_url", 7, stored_at=300.0))
+        second.commit()
+        self.assertEqual(first.reload("stops_url"), 7)
+        # unless it is forced, as reparse does
+        self.assertTrue(first.put("stops_url", 4, stored_at=100.0, force=True))
+        self.assertEqual(first.get("stops_url"), 4)
+        first.close()
+        second.close()
+
+    def test_migrate_from_json_runs_once(self):
+        json_path = os.path.join(self.tmp_dir.name, 'cache.json')
+        with open(json_path, 'w') as file:
+            json.dump({"2025-05-25_url": [self.trip], "stops_url": 3}, file, cls=TripJSONEncoder)
+
+        cache = CacheStore(self.db_path)
+        self.assertEqual(cache.migrate_from_json(json_path), 2)
+        self.assertEqual(cache["2025-05-25_url"], [self.trip])
+        self.assertEqual(cache.migrate_from_json(json_path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
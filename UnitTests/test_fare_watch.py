@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+
+from fare_watch import FareWatch, diff_trips
+from fixtures import PRICED_PAGE, SiteSession, make_trip
+
+
+class TestDiffTrips(unittest.TestCase):
+
+    def test_changes(self):
+        previous = [make_trip(25.5), make_trip(80.1, departure="11:34 – 13:50"),
+                    make_trip(30.0, departure="12:04 – 14:41")]
+        current = [make_trip(19.0), make_trip(80.1, departure="11:34 – 13:50"),
+                   make_trip(45.0, departure="13:04 – 15:11")]
+        changes = [(kind, trip.departure_arrival, before.cost if before else None)
+                   for kind, trip, before in diff_trips(previous, current)]
+        self.assertEqual(changes, [('cheaper', "10:34 – 12:41", 25.5), ('new', "13:04 – 15:11", None),
+                                   ('sold_out', "12:04 – 14:41", None)])
+
+    def test_same_trips(self):
+        self.assertEqual(diff_trips([make_trip(25.5)], [make_trip(25.5)]), [])
+
+
+class TestFareWatch(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.session = SiteSession()
+        self.watch = FareWatch([('a', 'b')], days=6, session=self.session,
+                               cache_path=os.path.join(tmp_dir.name, 'cache.sqlite3'))
+        self.addCleanup(self.watch.close)
+        # midnight, so no train of today has left yet
+        self.now = datetime.combine(date.today(), datetime.min.time())
+
+    def test_only_changes_are_reported(self):
+        self.assertEqual(self.watch.poll(self.now), [])
+        self.assertEqual(self.watch.poll(self.now), [])
+
+        # the first train gets cheaper and the second one sells out
+        requests = self.session.requests
+        self.session.page = PRICED_PAGE.replace('&pound;25.50', '&pound;21.00')
+        self.session.page = self.session.page.split('<li id="result1">')[0] + \
+            '<li id="result2">' + self.session.page.split('<li id="result2">')[1]
+        events = self.watch.poll(self.now)
+
+        # two weekdays, outbound and return
+        self.assertEqual(sorted((event['event'], event['type']) for event in events),
+                         [('cheaper', 'outbound')] * 2 + [('cheaper', 'return')] * 2 +
+                         [('sold_out', 'outbound')] * 2 + [('sold_out', 'return')] * 2)
+        cheaper = next(event for event in events if event['event'] == 'cheaper')
+        self.assertEqual((cheaper['cost'], cheaper['previous_cost']), (21.0, 25.5))
+        # only the fare pages are fetched again (the page and its earlier page outbound, the page alone on the
+        # way back), the calling points come from the cache
+        self.assertEqual(self.session.requests - requests, 6)
+        self.assertFalse(any('/calling/' in url for url in self.session.urls[requests:]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+import requests
+
+from http_client import AdaptiveConcurrency, FetchError, HttpClient, retry_after_seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ''
+        self.content = b''
+
+
+class FakeSession:
+    """Answers requests with the given responses in turn, an exception in the list is raised instead."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.cookies = {}
+        self.requests = []
+        self.handshakes = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests.append((method, url))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    def get(self, url, **kwargs):
+        self.handshakes += 1
+        self.cookies['session'] = str(self.handshakes)
+        return FakeResponse()
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def client(self, responses, max_retries=3):
+        return HttpClient(FakeSession(responses), "https://traintimes.org.uk", max_retries=max_retries, backoff=0)
+
+    def test_retries_throttled_responses(self):
+        client = self.client([FakeResponse(429), FakeResponse(503), FakeResponse(200)])
+        self.assertEqual(client.request('POST', "https://traintimes.org.uk/a/b").status_code, 200)
+        self.assertEqual(len(client.session.requests), 3)
+
+    def test_retries_connection_errors(self):
+        client = self.client([requests.ConnectionError("reset"), FakeResponse(200)])
+        self.assertEqual(client.request('GET', "https://traintimes.org.uk/calling/1").status_code, 200)
+
+    def test_body_cut_short_is_retried_then_a_fetch_error(self):
+        cut_short = requests.exceptions.ChunkedEncodingError("connection broken")
+        client = self.client([cut_short, FakeResponse(200)])
+        self.assertEqual(client.request('POST', "https://traintimes.org.uk/a/b").status_code, 200)
+
+        client = self.client([cut_short] * 2, max_retries=1)
+        with self.assertRaises(FetchError):
+            client.request('POST', "https://traintimes.org.uk/a/b")
+
+    def test_teapot_primes_cookies_again(self):
+        client = self.client([FakeResponse(418), FakeResponse(200)])
+        client.prime()
+        self.assertEqual(client.request('POST', "https://traintimes.org.uk/a/b").status_code, 200)
+        self.assertEqual(client.session.handshakes, 2)
+
+    def test_gives_up_after_retries(self):
+        client = self.client([FakeResponse(503)] * 3, max_retries=2)
+        with self.assertRaises(FetchError):
+            client.request('POST', "https://traintimes.org.uk/a/b")
+
+    def test_other_statuses_are_returned(self):
+        client = self.client([FakeResponse(404)])
+        self.assertEqual(client.request('GET', "https://traintimes.org.uk/calling/1").status_code, 404)
+        self.assertEqual(len(client.session.requests), 1)
+
+    def test_cookies_are_primed_by_the_first_request(self):
+        client = self.client([FakeResponse(200), FakeResponse(200)])
+        self.assertEqual(client.session.handshakes, 0)
+        client.request('POST', "https://traintimes.org.uk/a/b")
+        client.request('POST', "https://traintimes.org.uk/a/c")
+        self.assertEqual(client.session.handshakes, 1)
+
+    def test_offline_client_sends_nothing(self):
+        client = HttpClient(FakeSession([]), "https://traintimes.org.uk", offline=True)
+        with self.assertRaises(FetchError):
+            client.request('POST', "https://traintimes.org.uk/a/b")
+        self.assertEqual(client.session.handshakes, 0)
+
+    def test_retry_after(self):
+        self.assertEqual(retry_after_seconds("120"), 120.0)
+        self.assertEqual(retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT", now=1445412470), 10.0)
+        self.assertIsNone(retry_after_seconds("soon"))
+        self.assertIsNone(retry_after_seconds(None))
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+
+    def test_additive_increase(self):
+        concurrency = AdaptiveConcurrency(initial=2, maximum=8)
+        for _ in range(4):
+            concurrency.release(concurrency.acquire())
+        self.assertGreaterEqual(int(concurrency.limit), 3)
+
+    def test_multiplicative_decrease_once_per_round(self):
+        concurrency = AdaptiveConcurrency(initial=8, maximum=8)
+        tokens = [concurrency.acquire() for _ in range(4)]
+        for token in tokens:
+            concurrency.release(token, throttled=True)
+        self.assertEqual(concurrency.limit, 4)
+
+        concurrency.release(concurrency.acquire(), throttled=True)
+        self.assertEqual(concurrency.limit, 2)
+
+    def test_limits(self):
+        concurrency = AdaptiveConcurrency(initial=1, maximum=2)
+        for _ in range(20):
+            concurrency.release(concurrency.acquire())
+        self.assertEqual(concurrency.limit, 2)
+        for _ in range(5):
+            concurrency.release(concurrency.acquire(), throttled=True)
+        self.assertEqual(concurrency.limit, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
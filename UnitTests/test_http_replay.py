@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from http_replay import FixtureMissingError, RecordingSession, ReplaySession
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'text/html'}
+
+
+class FakeSession:
+    def __init__(self):
+        self.cookies = {'session': 'abc'}
+
+    def request(self, method, url, **kwargs):
+        return FakeResponse(f"{method} {url}")
+
+
+class TestRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fixtures = os.path.join(self.tmp_dir.name, 'fixtures')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replay_serves_recorded_responses(self):
+        recorder = RecordingSession(self.fixtures, FakeSession())
+        recorder.post("https://traintimes.org.uk/a/b/10:30a/2025-05-25")
+        recorder.get("https://traintimes.org.uk/calling/1")
+        self.assertEqual(recorder.cookies, {'session': 'abc'})
+
+        replay = ReplaySession(self.fixtures)
+        response = replay.post("https://traintimes.org.uk/a/b/10:30a/2025-05-25")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, "POST https://traintimes.org.uk/a/b/10:30a/2025-05-25")
+        self.assertEqual(replay.get("https://traintimes.org.uk/calling/1").text,
+                         "GET https://traintimes.org.uk/calling/1")
+        self.assertEqual(replay.request_count, 2)
+
+    def test_replay_missing_fixture_raises(self):
+        replay = ReplaySession(self.fixtures)
+        with self.assertRaises(FixtureMissingError):
+            replay.get("https://traintimes.org.uk/")
+
+
+if __name__ == '__main__':
+    unittest.main()
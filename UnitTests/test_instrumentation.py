@@ -0,0 +1,36 @@
+import unittest
+
+from instrumentation import NULL_PROFILER, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_stages_counters_and_hit_ratios(self):
+        profiler = Profiler()
+        events = []
+        profiler.add_listener(lambda name, value: events.append(name))
+
+        with profiler.stage('http.POST'):
+            pass
+        profiler.record('http.POST', 0.5)
+        profiler.count('cache_hit.fares', 3)
+        profiler.count('cache_miss.fares')
+        profiler.count('cache_miss.stops')
+
+        report = profiler.report()
+        self.assertEqual(report['stages']['http.POST']['count'], 2)
+        self.assertAlmostEqual(report['stages']['http.POST']['max_ms'], 500)
+        self.assertEqual(report['counters']['cache_hit.fares'], 3)
+        self.assertEqual(report['cache_hit_ratios'], {'fares': 0.75, 'stops': 0.0})
+        self.assertEqual(events, ['http.POST', 'http.POST', 'cache_hit.fares', 'cache_miss.fares', 'cache_miss.stops'])
+        self.assertIn('http.POST', profiler.format_table())
+
+    def test_disabled_profiler_records_nothing(self):
+        with NULL_PROFILER.stage('http.GET'):
+            NULL_PROFILER.count('requests')
+        self.assertEqual(NULL_PROFILER.report()['stages'], {})
+        self.assertEqual(NULL_PROFILER.report()['counters'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
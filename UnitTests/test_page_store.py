@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from cache_policy import CachePolicy
+from cache_store import CacheStore
+from fixtures import BASE_URL, CALLING_PAGE, PRICED_PAGE, RESULTS_PAGE
+from page_store import PageStore
+from reparse import reparse_pages
+
+
+class TestPageStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = PageStore(os.path.join(self.tmp_dir.name, 'pages'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_pages_are_stored_once_per_content(self):
+        first = self.store.put('POST', f"{BASE_URL}/a/b/10:30a/2026-11-03", 200, RESULTS_PAGE, 'results')
+        second = self.store.put('POST', f"{BASE_URL}/a/b/10:30a/2026-11-10", 200, RESULTS_PAGE, 'results')
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.get('post', f"{BASE_URL}/a/b/10:30a/2026-11-03"), RESULTS_PAGE)
+        self.assertIsNone(self.store.get('POST', f"{BASE_URL}/a/b/10:30a/2026-11-17"))
+        self.assertTrue(os.path.exists(PageStore.object_path(self.store.directory, first)))
+
+    def test_reparse_rebuilds_the_cache(self):
+        url = f"{BASE_URL}/a/b/10:30a/2026-11-03"
+        self.store.put('POST', url, 200, PRICED_PAGE, 'results')
+        self.store.put('GET', f"{BASE_URL}/calling/1", 200, CALLING_PAGE, 'calling')
+        self.store.put('GET', f"{BASE_URL}/calling/2", 200, CALLING_PAGE, 'calling')
+        self.store.link_fare(f"2026-11-03_{BASE_URL}/a/b/10:30a", 'OUTBOUND', date(2026, 11, 3), 'a', 'b', None,
+                             [url])
+        # a fare whose page was never stored can't be rebuilt
+        self.store.link_fare(f"2026-11-04_{BASE_URL}/a/b/10:30a", 'OUTBOUND', date(2026, 11, 4), 'a', 'b', None,
+                             [f"{BASE_URL}/a/b/10:30a/2026-11-04"])
+
+        cache = CacheStore(os.path.join(self.tmp_dir.name, 'cache.sqlite3'))
+        self.assertEqual(reparse_pages(self.store, cache, max_stops=4, workers=2), (1, 1))
+
+        self.assertEqual(cache.get(f"stops_{BASE_URL}/calling/1"), 3)
+        trips = cache.get(f"2026-11-03_{BASE_URL}/a/b/10:30a")
+        cache.close()
+        self.assertEqual([trip.cost for trip in trips], [25.50, 80.10])
+        self.assertEqual([trip.num_stops for trip in trips], [3, 3])
+
+    def test_reparse_replaces_existing_entries(self):
+        url = f"{BASE_URL}/a/b/10:30a/2026-11-03"
+        cache_key = f"2026-11-03_{BASE_URL}/a/b/10:30a"
+        self.store.put('POST', url, 200, PRICED_PAGE, 'results')
+        self.store.put('GET', f"{BASE_URL}/calling/1", 200, CALLING_PAGE, 'calling')
+        self.store.put('GET', f"{BASE_URL}/calling/2", 200, CALLING_PAGE, 'calling')
+        self.store.link_fare(cache_key, 'OUTBOUND', date(2026, 11, 3), 'a', 'b', None, [url])
+
+        # stored after the pages, as the finder does, by a parser that got the calling points wrong
+        cache = CacheStore(os.path.join(self.tmp_dir.name, 'cache.sqlite3'))
+        cache.put(f"stops_{BASE_URL}/calling/1", 99)
+        cache.put(cache_key, [])
+        self.assertEqual(reparse_pages(self.store, cache, max_stops=4, workers=1), (1, 0))
+
+        self.assertEqual(cache.get(f"stops_{BASE_URL}/calling/1"), 3)
+        trips = cache.get(cache_key)
+        cache.close()
+        self.assertEqual([trip.cost for trip in trips], [25.50, 80.10])
+
+    def store_fare_pages(self, age):
+        """Pages of one fare as if fetched ``age`` seconds ago, returns its cache key."""
+        url = f"{BASE_URL}/a/b/10:30a/2026-11-03"
+        cache_key = f"2026-11-03_{BASE_URL}/a/b/10:30a"
+        self.store.put('POST', url, 200, PRICED_PAGE, 'results')
+        self.store.put('GET', f"{BASE_URL}/calling/1", 200, CALLING_PAGE, 'calling')
+        self.store.put('GET', f"{BASE_URL}/calling/2", 200, CALLING_PAGE, 'calling')
+        self.store.link_fare(cache_key, 'OUTBOUND', date(2026, 11, 3), 'a', 'b', None, [url])
+        self.store._conn.execute("UPDATE pages SET fetched_at = fetched_at - ?", (age,))
+        self.store._conn.execute("UPDATE fares SET fetched_at = fetched_at - ?", (age,))
+        self.store._conn.commit()
+        return cache_key
+
+    def test_reparse_skips_entries_the_policy_has_expired(self):
+        self.store_fare_pages(age=40 * 24 * 60 * 60)
+
+        cache = CacheStore(os.path.join(self.tmp_dir.name, 'cache.sqlite3'), policy=CachePolicy())
+        self.assertEqual(reparse_pages(self.store, cache, max_stops=4, workers=1), (0, 1))
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_reparse_keeps_entries_of_a_newer_fetch(self):
+        cache_key = self.store_fare_pages(age=60 * 60)
+
+        # stored an hour after the pages, from pages fetched again since
+        cache = CacheStore(os.path.join(self.tmp_dir.name, 'cache.sqlite3'))
+        cache.put(f"stops_{BASE_URL}/calling/1", 4)
+        cache.put(cache_key, [])
+        self.assertEqual(reparse_pages(self.store, cache, max_stops=4, workers=1), (0, 1))
+
+        self.assertEqual(cache.get(f"stops_{BASE_URL}/calling/1"), 4)
+        self.assertEqual(cache.get(cache_key), [])
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
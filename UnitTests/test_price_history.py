@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from datetime import date, datetime
+
+import price_queries
+from price_history import PriceHistory
+from fixtures import make_trip
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestPriceHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.history = PriceHistory(self.tmp_dir.name)
+        # observed on 2026-11-01, a Sunday
+        self.observed_at = datetime(2026, 11, 1, 12, 0).timestamp()
+        self.history.append('a', 'b', [make_trip(25.5, travel_date=date(2026, 11, 3)),
+                                       make_trip(80.1, travel_date=date(2026, 11, 4))], self.observed_at)
+        self.history.flush()
+        self.history.append('c', 'd', [make_trip(40.0, travel_date=date(2026, 11, 10))], self.observed_at)
+        self.history.append('a', 'b', [make_trip(19.0, travel_date=date(2026, 11, 17))], self.observed_at)
+        self.history.flush()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_merges_segments(self):
+        self.assertEqual(len(self.history), 4)
+        self.assertEqual(len(self.history.segments()), 2)
+        routes, columns = self.history.load(use_numpy=False)
+        self.assertEqual(routes, ['a:b', 'c:d'])
+        self.assertEqual(list(columns['route']), [0, 0, 1, 0])
+        self.assertEqual(list(columns['cost']), [25.5, 80.1, 40.0, 19.0])
+        self.assertEqual(list(columns['departure']), [634, 634, 634, 634])
+        self.assertEqual(columns['travel_date'][0], date(2026, 11, 3).toordinal())
+
+    def test_compact(self):
+        self.assertEqual(self.history.compact(), 2)
+        self.assertEqual(len(self.history.segments()), 1)
+        routes, columns = self.history.load(use_numpy=False)
+        self.assertEqual([routes[code] for code in columns['route']], ['a:b', 'a:b', 'c:d', 'a:b'])
+
+    def _check_queries(self, use_numpy):
+        routes, columns = self.history.load(use_numpy=use_numpy)
+        route_columns = price_queries.select(routes, columns, 'a:b')
+        self.assertEqual(len(route_columns['cost']), 3)
+        self.assertEqual(price_queries.cheapest_by_weekday(route_columns), {'tue': 19.0, 'wed': 80.1})
+        self.assertEqual(price_queries.fare_percentiles(route_columns, (0, 50, 100)), {0: 19.0, 50: 25.5, 100: 80.1})
+        self.assertEqual(price_queries.price_by_days_before(route_columns, bucket_days=7),
+                         [(0, 2, (25.5 + 80.1) / 2, 25.5), (14, 1, 19.0, 19.0)])
+
+    def test_queries_on_arrays(self):
+        self._check_queries(use_numpy=False)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_queries_on_numpy(self):
+        self._check_queries(use_numpy=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
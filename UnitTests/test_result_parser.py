@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime
+
+from fixtures import BASE_URL, RESULTS_PAGE
+from result_parser import FastResultPage, SoupResultPage, parse_journey_time, parse_price
+from trip_classes import TripType
+
+
+class TestResultParsers(unittest.TestCase):
+
+    def _candidates(self, page_class, html_text, no_changes=True):
+        page = page_class.from_html(html_text, BASE_URL, no_changes)
+        return page.trip_candidates(TripType.OUTBOUND, datetime(2025, 5, 25))
+
+    def test_fast_parser_matches_soup_parser(self):
+        for no_changes in (True, False):
+            soup_candidates = self._candidates(SoupResultPage, RESULTS_PAGE, no_changes)
+            fast_candidates = self._candidates(FastResultPage, RESULTS_PAGE, no_changes)
+            self.assertEqual(soup_candidates, fast_candidates)
+
+    def test_candidates(self):
+        candidates = self._candidates(FastResultPage, RESULTS_PAGE)
+        self.assertEqual(len(candidates), 3)
+        trip, stops_url, has_price = candidates[0]
+        self.assertEqual(trip.cost, 25.5)
+        self.assertEqual(trip.travel_time_minutes, 127)
+        self.assertEqual(trip.date, "May 25, 2025")
+        self.assertEqual(stops_url, BASE_URL + "/calling/1")
+        self.assertTrue(has_price)
+        self.assertEqual(candidates[1][0].cost, 80.1)
+        self.assertFalse(candidates[2][2])
+
+    def test_links_and_error_message(self):
+        for page_class in (SoupResultPage, FastResultPage):
+            page = page_class.from_html(RESULTS_PAGE, BASE_URL)
+            self.assertEqual(page.link('out-earlier'), "/earlier")
+            self.assertIsNone(page.link('out-later'))
+            self.assertFalse(page.is_too_far())
+            error_page = page_class.from_html('<p class="big error-message">Too far</p>', BASE_URL)
+            self.assertTrue(error_page.is_too_far())
+
+    def test_parse_helpers(self):
+        self.assertEqual(parse_journey_time("takes 1h  5m"), ("1h  5m", 65))
+        self.assertIsNone(parse_journey_time("no time"))
+        self.assertEqual(parse_price("£12.30 Advance Single or £40.00 Single"), 12.3)
+        self.assertIsNone(parse_price("no fare"))
+
+
+if __name__ == '__main__':
+    unittest.main()
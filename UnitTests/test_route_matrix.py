@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+from fixtures import SiteSession, month_after_next
+from page_store import PageStore
+from route_matrix import Route, RouteMatrix, parse_route
+
+
+class TestParseRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.default_start = datetime(2025, 6, 10)
+
+    def test_route_without_months_uses_default_start(self):
+        route = parse_route("warrington+bank+quay:london+euston", self.default_start)
+        self.assertEqual(route, Route("warrington+bank+quay", "london+euston", self.default_start))
+        self.assertEqual(route.name, "warrington+bank+quay:london+euston")
+        self.assertEqual(route.month_starts(), [self.default_start])
+
+    def test_route_with_month_range(self):
+        route = parse_route("a:b:2025-11..2026-02", self.default_start)
+        self.assertEqual(route.month_starts(), [datetime(2025, 11, 1), datetime(2025, 12, 1),
+                                                datetime(2026, 1, 1), datetime(2026, 2, 1)])
+
+    def test_invalid_route_raises(self):
+        with self.assertRaises(ValueError):
+            parse_route("only-one-station", self.default_start)
+
+
+
+class TestRouteMatrix(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = tmp_dir.name
+        self.cache_path = os.path.join(tmp_dir.name, 'cache.sqlite3')
+
+    def test_finder_options_reach_every_route(self):
+        session = SiteSession()
+        routes = [Route("a", "b", month_after_next()), Route("c", "d", month_after_next())]
+        matrix = RouteMatrix(routes, workers=2, session=session, cache_path=self.cache_path,
+                             outbound_window=(6 * 60, 9 * 60), return_window=(18 * 60, 21 * 60))
+        results = matrix.search()
+
+        self.assertEqual(sorted(results), ["a:b", "c:d"])
+        for station_from, station_to in (("a", "b"), ("c", "d")):
+            self.assertTrue(any(f"/{station_from}/{station_to}/06:00/" in url for url in session.urls))
+            self.assertTrue(any(f"/{station_to}/{station_from}/18:00/" in url for url in session.urls))
+
+    def test_max_cost_stops_each_route_early(self):
+        requests = {}
+        for max_cost in (None, 1000.0):
+            session = SiteSession()
+            matrix = RouteMatrix([Route("a", "b", month_after_next())], workers=1, session=session,
+                                 disable_cache=True, cache_path=self.cache_path)
+            results = matrix.search(max_cost)
+            self.assertTrue(results["a:b"].same_day_tuesday)
+            requests[max_cost] = session.requests
+        self.assertLess(requests[1000.0], requests[None])
+
+    def test_pages_of_every_route_are_stored(self):
+        page_store = PageStore(os.path.join(self.tmp_dir, 'pages'))
+        self.addCleanup(page_store.close)
+        routes = [Route("a", "b", month_after_next()), Route("c", "d", month_after_next())]
+        RouteMatrix(routes, workers=2, session=SiteSession(), cache_path=self.cache_path,
+                    page_store=page_store).search()
+
+        self.assertEqual({(fare['origin'], fare['destination']) for fare in page_store.fares()},
+                         {("a", "b"), ("b", "a"), ("c", "d"), ("d", "c")})
+        self.assertTrue(page_store.pages('calling'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from datetime import date, timedelta
+
+from fixtures import SiteSession
+from ticket_service import TicketService, make_server
+
+
+class TestTicketService(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.session = SiteSession()
+        self.service = TicketService(workers=2, session=self.session, refresh_interval=0,
+                                     cache_path=os.path.join(tmp_dir.name, 'cache.sqlite3'))
+        self.addCleanup(self.service.close)
+        self.server = make_server(self.service, port=0)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # a week starting next Monday, its Tuesday and Wednesday are searched
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+        self.start, self.end = monday, monday + timedelta(days=6)
+
+    def get(self, path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.server.server_port}{path}") as response:
+            return json.load(response)
+
+    def test_results_are_answered_from_the_warm_cache(self):
+        path = f"/results?from=a&to=b&start={self.start}&end={self.end}"
+        body = self.get(path)
+        self.assertEqual(body['route'], 'a:b')
+        self.assertEqual(len(body['results']['same_day_tuesday']), 2)
+        self.assertEqual(len(body['results']['overnight_stays']), 2)
+        self.assertGreater(self.session.requests, 0)
+
+        requests = self.session.requests
+        self.assertEqual(self.get(path)['results'], body['results'])
+        self.assertEqual(self.session.requests, requests)
+        self.assertEqual(self.get('/status')['routes'], ['a:b'])
+
+    def test_refresh_fetches_fares_expiring_before_the_next_pass(self):
+        self.service.query('a', 'b', date.today(), date.today() + timedelta(days=self.service.refresh_days))
+        requests = self.session.requests
+        self.service.refresh_interval = 900
+        self.service.refresh()
+        self.assertEqual(self.session.requests, requests)
+
+        # fares expiring within a day are fetched again, the calling points stay cached
+        self.service.refresh_interval = 24 * 60 * 60
+        self.service.refresh()
+        self.assertGreater(self.session.requests, requests)
+        self.assertIsNotNone(self.get('/status')['last_refresh'])
+
+    def test_bad_queries(self):
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get('/results?from=a')
+        self.assertEqual(error.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get(f"/results?from=a&to=b&start={self.end}&end={self.start}")
+        self.assertEqual(error.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get("/results?from=a&to=b&weekdays=someday")
+        self.assertEqual(error.exception.code, 400)
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get("/results?from=a&to=b&max_nights=-1")
+        self.assertEqual(error.exception.code, 400)
+
+    def test_failed_queries_get_an_error_response(self):
+        def busy(*args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+        self.service.query = busy
+
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get(f"/results?from=a&to=b&start={self.start}&end={self.end}")
+        self.assertEqual(error.exception.code, 500)
+        self.assertEqual(json.load(error.exception), {'error': "OperationalError: database is locked"})
+
+    def test_bugs_are_not_answered_as_bad_queries(self):
+        def broken(*args, **kwargs):
+            raise TypeError("unsupported operand type(s)")
+        self.service.query = broken
+
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            self.get(f"/results?from=a&to=b&start={self.start}&end={self.end}")
+        self.assertEqual(error.exception.code, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import os
+import re
+import tempfile
+import time
+import unittest
+from datetime import date, datetime, timedelta
+
+from fixtures import BASE_URL, FakeResponse, SiteSession, month_after_next, results_page, weekdays_of
+from train_ticket_finder import TrainTicketFinder
+from trip_classes import TripType
+
+_URL_DATE = re.compile(r'/(\d{4}-\d{2}-\d{2})$')
+
+
+class TooFarSession(SiteSession):
+    """Answers the pages of dates from ``too_far`` on as too far in advance."""
+
+    def __init__(self, too_far):
+        super().__init__()
+        self.too_far = too_far
+
+    def request(self, method, url, **kwargs):
+        match = _URL_DATE.search(url)
+        if match and date.fromisoformat(match.group(1)) >= self.too_far:
+            self.urls.append(url)
+            return FakeResponse(results_page([], too_far=True))
+        return super().request(method, url, **kwargs)
+
+
+class SlowSession(SiteSession):
+    """Takes ``latency`` seconds to answer, so dates are still queued while the first ones are fetched."""
+
+    def __init__(self, latency=0.03):
+        super().__init__()
+        self.latency = latency
+
+    def request(self, method, url, **kwargs):
+        time.sleep(self.latency)
+        return super().request(method, url, **kwargs)
+
+
+class FinderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_path = os.path.join(tmp_dir.name, 'cache.sqlite3')
+
+    def finder(self, session, in_date=datetime(2026, 11, 1), **options):
+        finder = TrainTicketFinder(in_date, station_from='a', station_to='b', session=session,
+                                   cache_path=self.cache_path, quiet=True, **options)
+        self.addCleanup(finder.cache.close)
+        return finder
+
+
+class TestWindowWalk(FinderTestCase):
+
+    def test_window_segments_are_walked_up_to_the_next_segment(self):
+        day = "2026-11-03"
+        session = SiteSession({
+            # 06:00-09:00 segment, its later page reaches 09:00 so /later/2 is never needed
+            f"{BASE_URL}/a/b/06:00/{day}": results_page([("06:10 – 07:10", 20.0, "/calling/1"),
+                                                        ("07:00 – 08:00", 25.0, "/calling/2")], later="/later/1"),
+            f"{BASE_URL}/later/1": results_page([("08:00 – 09:00", 30.0, "/calling/3"),
+                                                 ("09:10 – 10:10", 35.0, "/calling/4")], later="/later/2"),
+            # 09:00-12:00 segment, 09:10 is listed again and 12:30 is past the window
+            f"{BASE_URL}/a/b/09:00/{day}": results_page([("09:10 – 10:10", 35.0, "/calling/4"),
+                                                        ("11:30 – 12:30", 40.0, "/calling/5")], later="/later/3"),
+            f"{BASE_URL}/later/3": results_page([("12:30 – 13:30", 45.0, "/calling/6")], later="/later/4"),
+        })
+        finder = self.finder(session, outbound_window=(6 * 60, 12 * 60), window_step=180)
+
+        trips = finder._fetch_train_prices(date(2026, 11, 3), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual(sorted(trip.departure_arrival for trip in trips),
+                         ["06:10 – 07:10", "07:00 – 08:00", "08:00 – 09:00", "09:10 – 10:10", "11:30 – 12:30"])
+        self.assertNotIn(f"{BASE_URL}/later/2", session.urls)
+        self.assertNotIn(f"{BASE_URL}/later/4", session.urls)
+        # the end of the window is part of the key, another window is cached apart
+        self.assertEqual(finder.cache.get(f"{day}_{BASE_URL}/a/b/06:00-12:00"), trips)
+
+    def test_trains_past_midnight_are_dropped(self):
+        day = "2026-11-03"
+        session = SiteSession({
+            f"{BASE_URL}/a/b/20:00/{day}": results_page([("20:30 – 21:30", 20.0, "/calling/1"),
+                                                        ("22:00 – 23:00", 25.0, "/calling/2")], later="/night/1"),
+            # the times start again from 00:00, those trains leave the next day
+            f"{BASE_URL}/night/1": results_page([("23:30 – 00:30", 30.0, "/calling/3"),
+                                                 ("00:15 – 01:15", 15.0, "/calling/4")], later="/night/2"),
+        })
+        finder = self.finder(session, outbound_window=(20 * 60, 23 * 60 + 59), window_step=600)
+
+        trips = finder._fetch_train_prices(date(2026, 11, 3), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual([trip.departure_arrival for trip in trips],
+                         ["20:30 – 21:30", "22:00 – 23:00", "23:30 – 00:30"])
+        self.assertNotIn(f"{BASE_URL}/night/2", session.urls)
+        self.assertNotIn(f"{BASE_URL}/calling/4", session.urls)
+
+
+class TestCallingPoints(FinderTestCase):
+
+    def test_calling_points_of_both_pages_are_fetched_once_as_a_batch(self):
+        long_stopper = "<table><tbody>" + "<tr><td>stop</td></tr>" * 6 + "</tbody></table>"
+        session = SiteSession({
+            f"{BASE_URL}/a/b/10:30a/2026-11-03": results_page([("10:34 – 11:34", 20.0, "/calling/1"),
+                                                               ("11:04 – 12:04", 25.0, "/calling/2")],
+                                                              earlier="/earlier/1"),
+            # the earlier page lists the 10:34 again, and a train stopping too often
+            f"{BASE_URL}/earlier/1": results_page([("09:30 – 10:45", 15.0, "/calling/3"),
+                                                   ("10:34 – 11:34", 20.0, "/calling/1")]),
+            f"{BASE_URL}/calling/3": long_stopper,
+        })
+        finder = self.finder(session, workers=4, max_stops=4)
+
+        trips = finder._fetch_train_prices(date(2026, 11, 3), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual(sorted(trip.departure_arrival for trip in trips), ["10:34 – 11:34", "11:04 – 12:04"])
+        calling_urls = [url for url in session.urls if '/calling/' in url]
+        self.assertEqual(sorted(calling_urls), [f"{BASE_URL}/calling/{number}" for number in (1, 2, 3)])
+        # both results pages are parsed before any calling points are asked for
+        first_calling = session.urls.index(calling_urls[0])
+        self.assertTrue(all('/calling/' in url for url in session.urls[first_calling:]))
+
+    def test_same_service_on_a_later_week_is_answered_from_the_service_index(self):
+        session = SiteSession({
+            f"{BASE_URL}/a/b/10:30a/2026-11-03": results_page([("10:34 – 11:34", 20.0, "/calling/1")]),
+            # the same train a week later, its calling points have another url
+            f"{BASE_URL}/a/b/10:30a/2026-11-10": results_page([("10:34 – 11:34", 22.0, "/calling/7")]),
+        })
+        finder = self.finder(session)
+        finder._fetch_train_prices(date(2026, 11, 3), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual(finder.cache.get("service_a_b_10:34-11:34_weekday"), 3)
+
+        trips = finder._fetch_train_prices(date(2026, 11, 10), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual([trip.num_stops for trip in trips], [3])
+        self.assertNotIn(f"{BASE_URL}/calling/7", session.urls)
+
+    def test_a_train_without_calling_points_is_dropped_alone(self):
+        session = SiteSession({
+            f"{BASE_URL}/a/b/10:30a/2026-11-03": results_page([("10:34 – 11:34", 20.0, "/calling/1"),
+                                                               ("11:04 – 12:04", 25.0, "/calling/2")]),
+            f"{BASE_URL}/calling/2": "<p>No calling points</p>",
+        })
+        finder = self.finder(session)
+
+        trips = finder._fetch_train_prices(date(2026, 11, 3), finder.url_outbound, TripType.OUTBOUND)
+        self.assertEqual([trip.departure_arrival for trip in trips], ["10:34 – 11:34"])
+        # the page is fetched again next time rather than cached without the 11:04
+        self.assertIsNone(finder.cache.get(f"2026-11-03_{finder.url_outbound}"))
+        self.assertIsNone(finder.cache.get("service_a_b_11:04-12:04_weekday"))
+        self.assertEqual(finder.cache.get("service_a_b_10:34-11:34_weekday"), 3)
+
+
+class TestConcurrentDates(FinderTestCase):
+
+    def test_workers_give_the_serial_results(self):
+        month_start = month_after_next()
+        too_far = weekdays_of(month_start, 2)[1]
+        results = {}
+        for workers in (1, 4):
+            session = TooFarSession(too_far)
+            finder = self.finder(session, month_start, disable_cache=True, workers=workers)
+            date_results = list(finder.iter_trip_data())
+            self.assertTrue(date_results)
+            # the second Tuesday comes back before the second Wednesday, its stay doesn't
+            self.assertTrue(all(result.return_date < too_far for result in date_results))
+            results[workers] = finder.fetch_trip_data()
+            if workers == 1:
+                # the serial path doesn't even ask for the later dates
+                requested = [date.fromisoformat(_URL_DATE.search(url).group(1)) for url in session.urls
+                             if _URL_DATE.search(url)]
+                self.assertEqual(max(requested), too_far)
+
+        self.assertEqual(results[1], results[4])
+        self.assertEqual(len(results[1].same_day_tuesday), 2 * 2)
+        self.assertEqual(len(results[1].overnight_stays), 2)
+
+
+class TestStreaming(FinderTestCase):
+
+    def test_results_are_streamed_in_date_order(self):
+        month_start = month_after_next()
+        finder = self.finder(SiteSession(), month_start, workers=4)
+        order = [(result.outbound_date, result.return_date) for result in finder.iter_trip_data()]
+
+        searched = sorted(weekdays_of(month_start, 1) + weekdays_of(month_start, 2))
+        expected = []
+        for day in searched:
+            expected.append((day, day))
+            # a stay follows as soon as the day it comes back on is known
+            if day - timedelta(days=1) in searched:
+                expected.append((day - timedelta(days=1), day))
+        self.assertEqual(order, expected)
+
+    def test_max_cost_stops_the_scan_and_cancels_queued_dates(self):
+        month_start = month_after_next()
+        session = SlowSession()
+        finder = self.finder(session, month_start, workers=2)
+        date_results = list(finder.iter_trip_data(max_cost=60.0))
+
+        self.assertEqual(len(date_results), 1)
+        self.assertLessEqual(date_results[0].best[0].cost(), 60.0)
+        requested = {_URL_DATE.search(url).group(1) for url in session.urls if _URL_DATE.search(url)}
+        searched = weekdays_of(month_start, 1) + weekdays_of(month_start, 2)
+        self.assertLess(len(requested), len(searched) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from trip_classes import Trip, TripType
+from trip_codec import decode_trips, encode_trips, is_trip_list
+
+
+class TestTripCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.trips = [
+            Trip(type=TripType.OUTBOUND, cost=25.5, departure_arrival="10:34 – 12:41", travel_time_str="2h 7m",
+                 travel_time_minutes=127, date="May 25, 2025", num_stops=3),
+            Trip(type=TripType.RETURN, cost=80.1, departure_arrival="Unknown", travel_time_str="",
+                 travel_time_minutes=0, date="June 03, 2025", num_stops=0),
+        ]
+
+    def test_round_trip(self):
+        decoded = decode_trips(encode_trips(self.trips))
+        self.assertEqual(decoded, self.trips)
+        self.assertEqual([hash(trip) for trip in decoded], [hash(trip) for trip in self.trips])
+        self.assertEqual(decoded[0].date, "May 25, 2025")
+        self.assertEqual((decoded[0].departure_minutes, decoded[0].arrival_minutes), (634, 761))
+        self.assertEqual((decoded[1].departure_minutes, decoded[1].arrival_minutes), (-1, -1))
+
+    def test_is_trip_list(self):
+        self.assertTrue(is_trip_list(self.trips))
+        self.assertFalse(is_trip_list([]))
+        self.assertFalse(is_trip_list(3))
+
+    def test_invalid_data(self):
+        with self.assertRaises(ValueError):
+            decode_trips(b'[]')
+
+
+class TestTrip(unittest.TestCase):
+
+    def test_hash_follows_changes(self):
+        trip = Trip(type=TripType.OUTBOUND, cost=10.0, date="May 25, 2025")
+        other = Trip(type=TripType.OUTBOUND, cost=10.0, date="May 25, 2025")
+        self.assertEqual(hash(trip), hash(other))
+        trip.num_stops = 4
+        self.assertNotEqual(trip, other)
+        other.num_stops = 4
+        self.assertEqual(hash(trip), hash(other))
+
+
+if __name__ == '__main__':
+    unittest.main()
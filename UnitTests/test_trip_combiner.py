@@ -0,0 +1,47 @@
+import itertools
+import random
+import unittest
+
+from fixtures import make_trip
+from trip_classes import TripType
+from trip_combiner import TripCombiner, best_combinations, pareto_frontier, top_k
+
+
+class TestTripCombiner(unittest.TestCase):
+
+    def test_top_k_matches_sort_and_slice(self):
+        trips = [make_trip(cost, TripType.OUTBOUND, minutes) for cost, minutes in
+                 [(30, 120), (20, 130), (20, 125), (45, 100), (20, 125)]]
+        expected = sorted(trips, key=lambda t: (t.cost, t.travel_time_minutes))[:3]
+        self.assertEqual(top_k(trips, 3), expected)
+
+    def test_best_combinations_matches_cross_product(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            outbound = top_k([make_trip(rng.randint(10, 60), TripType.OUTBOUND) for _ in range(6)], 6)
+            return_trips = top_k([make_trip(rng.randint(10, 60), TripType.RETURN) for _ in range(6)], 6)
+            expected = sorted(out.cost + ret.cost for out, ret in itertools.product(outbound, return_trips))[:4]
+            combinations = best_combinations(outbound, return_trips, 4)
+            self.assertEqual([trips.cost() for trips in combinations], expected)
+
+    def test_best_combinations_empty(self):
+        self.assertEqual(best_combinations([], [make_trip(10, TripType.RETURN)], 2), [])
+
+    def test_pareto_frontier(self):
+        cheap_slow = make_trip(20, TripType.OUTBOUND, 180, 6)
+        fast = make_trip(40, TripType.OUTBOUND, 120, 2)
+        dominated = make_trip(45, TripType.OUTBOUND, 130, 3)
+        few_stops = make_trip(50, TripType.OUTBOUND, 150, 1)
+        self.assertEqual(pareto_frontier([dominated, fast, few_stops, cheap_slow]), [cheap_slow, fast, few_stops])
+
+    def test_combiner_stays_and_duplicates(self):
+        combiner = TripCombiner(k=2)
+        tuesday_out = make_trip(20, TripType.OUTBOUND)
+        combiner.add_date("tue", [tuesday_out, tuesday_out, make_trip(25, TripType.OUTBOUND)], [])
+        combiner.add_date("fri", [], [make_trip(15, TripType.RETURN), make_trip(30, TripType.RETURN)])
+        self.assertEqual([trips.cost() for trips in combiner.combine("tue", "fri")], [35, 40])
+        self.assertEqual(combiner.combine("tue", "tue"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,9 @@
+import argparse
 import calendar
 import unittest
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from util_functions import create_date_pairs
+from util_functions import create_date_pairs, parse_time_window
 
 class TestCreateDatePairs(unittest.TestCase):
 
@@ -29,5 +30,18 @@ class TestCreateDatePairs(unittest.TestCase):
         count = len(weeks_with_day)
         self.assertEqual(len(pairs), count * 2)
 
+
+class TestParseTimeWindow(unittest.TestCase):
+
+    def test_parse_time_window(self):
+        self.assertEqual(parse_time_window("06:00-12:30"), (360, 750))
+
+    def test_parse_time_window_invalid(self):
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_time_window("12:00-06:00")
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_time_window("morning")
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
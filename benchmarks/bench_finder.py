@@ -0,0 +1,156 @@
+"""Offline benchmarks for TrainTicketFinder over fixtures recorded with --record.
+
+Record a month once against the live site:
+
+    python train_ticket_finder.py --month 6 --year 2025 --record fixtures/june
+
+then measure any change against the same responses:
+
+    python benchmarks/bench_finder.py --fixtures fixtures/june --month 6 --year 2025 --latency 0.2 --workers 4
+
+Fixtures only replay the dates they were recorded for, and past dates are skipped by the finder, so record
+a fresh set once the recorded month is over.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache_store import CacheStore  # noqa: E402
+from http_replay import ReplaySession  # noqa: E402
+from result_parser import PAGE_PARSERS  # noqa: E402
+from train_ticket_finder import TrainTicketFinder  # noqa: E402
+from trip_classes import TripType  # noqa: E402
+
+
+def _timed(function, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def bench_fetch_trip_data(args):
+    """End-to-end fetch_trip_data over replayed responses, with a cold and a warm cache."""
+    rows = []
+    for label in ('cold', 'warm'):
+        timings = []
+        requests_made = 0
+        for _ in range(args.repeat):
+            previous_cwd = os.getcwd()
+            with tempfile.TemporaryDirectory() as cache_dir:
+                # the finder looks for a legacy JSON cache in the working directory
+                os.chdir(cache_dir)
+                cache_path = os.path.join(cache_dir, 'cache.sqlite3')
+                try:
+                    if label == 'warm':
+                        _run_finder(args, ReplaySession(args.fixtures), cache_path)
+                    session = ReplaySession(args.fixtures, args.latency)
+                    start = time.perf_counter()
+                    _run_finder(args, session, cache_path)
+                    timings.append(time.perf_counter() - start)
+                    requests_made = session.request_count
+                finally:
+                    os.chdir(previous_cwd)
+        rows.append((f"fetch_trip_data ({label} cache)", timings, f"{requests_made} requests"))
+    return rows
+
+
+def _run_finder(args, session, cache_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        finder = TrainTicketFinder(datetime(args.year, args.month, args.day), station_from=args.station_from,
+                                   station_to=args.station_to, workers=args.workers, parser=args.parser,
+                                   session=session, cache_path=cache_path)
+        return finder.fetch_trip_data()
+
+
+def _result_pages(fixtures):
+    for name in sorted(os.listdir(fixtures)):
+        with open(os.path.join(fixtures, name), 'r', encoding='utf-8') as file:
+            fixture = json.load(file)
+        if fixture['method'] == 'POST':
+            yield fixture['text']
+
+
+def bench_parse(args):
+    """Time spent turning the recorded results pages into trip candidates, per parser."""
+    pages = list(_result_pages(args.fixtures))
+    rows = []
+    for name, page_parser in sorted(PAGE_PARSERS.items()):
+        def parse_all():
+            candidates = 0
+            for html_text in pages:
+                page = page_parser.from_html(html_text, "https://traintimes.org.uk")
+                candidates += len(page.trip_candidates(TripType.OUTBOUND, datetime(args.year, args.month, 1)))
+            return candidates
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings, candidates = _timed(parse_all, args.repeat)
+        rows.append((f"parse {len(pages)} pages ({name})", timings, f"{candidates} candidates"))
+    return rows
+
+
+def bench_cache_io(args):
+    """Writes and reads of the cache with the trips parsed from the recorded pages."""
+    trips = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for html_text in _result_pages(args.fixtures):
+            page = PAGE_PARSERS['fast'].from_html(html_text, "https://traintimes.org.uk")
+            trips.append([trip for trip, _, _ in page.trip_candidates(TripType.OUTBOUND,
+                                                                     datetime(args.year, args.month, 1))])
+
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, 'bench.sqlite3')
+
+        def write_all():
+            cache = CacheStore(cache_path)
+            for index, page_trips in enumerate(trips):
+                cache[f"page_{index}"] = page_trips
+                cache.commit()
+            cache.close()
+
+        def read_all():
+            cache = CacheStore(cache_path)
+            found = sum(1 for index in range(len(trips)) if cache.get(f"page_{index}") is not None)
+            cache.close()
+            return found
+
+        rows.append((f"cache write {len(trips)} entries", _timed(write_all, args.repeat)[0], ""))
+        rows.append((f"cache read {len(trips)} entries", _timed(read_all, args.repeat)[0], ""))
+    return rows
+
+
+def print_report(rows):
+    print(f"{'benchmark':<40} {'median':>10} {'min':>10}  notes")
+    for name, timings, notes in rows:
+        print(f"{name:<40} {statistics.median(timings) * 1000:>8.1f}ms {min(timings) * 1000:>8.1f}ms  {notes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark TrainTicketFinder against recorded fixtures.')
+    parser.add_argument('--fixtures', required=True, help='Directory written by --record')
+    parser.add_argument('--month', type=int, required=True)
+    parser.add_argument('--year', type=int, required=True)
+    parser.add_argument('--day', type=int, default=1)
+    parser.add_argument('--station_from', default='warrington+bank+quay')
+    parser.add_argument('--station_to', default='london+euston')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--parser', choices=sorted(PAGE_PARSERS), default='soup')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated seconds per request')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    args.fixtures = os.path.abspath(args.fixtures)
+
+    print_report(bench_fetch_trip_data(args) + bench_parse(args) + bench_cache_io(args))
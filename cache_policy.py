@@ -0,0 +1,60 @@
+import re
+import time
+from datetime import date, datetime
+
+_DATE_KEY = re.compile(r'^(\d{4}-\d{2}-\d{2})_')
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+class CachePolicy:
+    """Decides how long each kind of cache entry stays fresh and how many entries are kept.
+
+    Fare pages (``{date}_{url}`` keys) change quickly for near dates, so their time to live grows with the
+    number of days between the time they were fetched and the travel date. Calling points (``stops_`` keys)
+    rarely change and are kept for much longer, the stop counts indexed by service (``service_`` keys) last
+    until the timetable is likely to have changed. The booking horizon of a route (``horizon_`` keys) moves on
+    every day.
+    """
+
+    def __init__(self, stops_ttl=30 * DAY, service_ttl=90 * DAY, fare_ttls=((2, 1 * HOUR), (7, 3 * HOUR), (30, 12 * HOUR)),
+                 fare_ttl_far=2 * DAY, default_ttl=None, max_entries=100_000, horizon_ttl=1 * DAY):
+        self.stops_ttl = stops_ttl
+        self.service_ttl = service_ttl
+        self.horizon_ttl = horizon_ttl
+        # (days ahead, ttl) tiers, the first tier whose days ahead is not exceeded wins
+        self.fare_ttls = tuple(sorted(fare_ttls))
+        self.fare_ttl_far = fare_ttl_far
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def travel_date(key):
+        """Return the travel date encoded at the start of a fare key, None for any other key."""
+        match = _DATE_KEY.match(key)
+        return date.fromisoformat(match.group(1)) if match else None
+
+    def ttl(self, key, now=None):
+        """Time to live in seconds for a key stored at ``now``, None if it never expires."""
+        if key.startswith('stops_'):
+            return self.stops_ttl
+        if key.startswith('service_'):
+            return self.service_ttl
+        if key.startswith('horizon_'):
+            return self.horizon_ttl
+
+        travel_date = self.travel_date(key)
+        if travel_date is None:
+            return self.default_ttl
+
+        today = datetime.fromtimestamp(now if now is not None else time.time()).date()
+        days_ahead = (travel_date - today).days
+        for max_days_ahead, ttl in self.fare_ttls:
+            if days_ahead <= max_days_ahead:
+                return ttl
+        return self.fare_ttl_far
+
+    def expires_at(self, key, now):
+        ttl = self.ttl(key, now)
+        return now + ttl if ttl is not None else None
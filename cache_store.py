@@ -0,0 +1,284 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from cache_policy import CachePolicy
+from trip_classes import TripJSONEncoder, trip_json_decoder
+from trip_codec import decode_trips, encode_trips, is_trip_list
+
+_MISSING = object()
+
+# directory of the cache shared by every run, unless a cache path is given
+CACHE_DIR_ENV = 'TICKETFINDER_CACHE_DIR'
+CACHE_FILE_NAME = 'train_prices_cache.sqlite3'
+
+
+def default_cache_path():
+    """$TICKETFINDER_CACHE_DIR, else $XDG_CACHE_HOME/ticketfinder, else ~/.cache/ticketfinder."""
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        directory = os.path.join(cache_home, 'ticketfinder')
+    return os.path.join(directory, CACHE_FILE_NAME)
+
+
+def encode_value(value):
+    """Trip lists are stored with the binary trip codec, anything else as JSON text."""
+    if is_trip_list(value):
+        return encode_trips(value)
+    return json.dumps(value, cls=TripJSONEncoder)
+
+
+def decode_value(stored):
+    # entries written before the binary codec, or migrated from the JSON cache, are JSON text
+    if isinstance(stored, bytes):
+        return decode_trips(stored)
+    return json.loads(stored, object_hook=trip_json_decoder)
+
+_COLUMNS = {
+    'stored_at': 'REAL',
+    'expires_at': 'REAL',
+    'accessed_at': 'REAL',
+    'travel_date': 'TEXT',
+}
+
+
+class CacheStore:
+    """Key/value cache persisted in SQLite, every put only writes the key it changes.
+
+    It behaves like the dict the finder used to keep in memory: ``in``, ``[]``, ``get`` and item assignment.
+    When ``read_enabled`` is False lookups only see the keys written during this run, so results are
+    refreshed from the site but still persisted for later runs.
+
+    Nothing is decoded up front: entries are looked up through the primary key index when they are first read
+    and the decoded values are kept in a bounded LRU memo, so startup time and memory do not grow with the file.
+
+    Every entry records when it was stored and when it expires according to the ``policy``. Expired entries
+    are treated as missing and ``evict`` removes them together with past travel dates and least recently used
+    entries above the policy's size limit. Without a policy entries never expire.
+
+    Several processes can use the same file at once: it is opened in WAL mode so readers don't block the
+    writer, a writer waits up to ``busy_timeout`` seconds for another one to finish, and a put only replaces an
+    entry stored earlier than its own, so a slow run can't overwrite fresher data written by another one.
+    """
+
+    def __init__(self, path, read_enabled=True, memo_size=4096, policy: CachePolicy = None, busy_timeout=30.0):
+        self.path = path
+        self.read_enabled = read_enabled
+        self.memo_size = memo_size
+        self.policy = policy
+        self._written = set()
+        # key -> (value, expires_at)
+        self._memo = OrderedDict()
+        # keys known not to be stored, filled by prefetch
+        self._absent = set()
+        # keys read since the last commit, their access time is written in bulk
+        self._accessed = set()
+        self._lock = threading.RLock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._create_schema()
+
+    def _create_schema(self):
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                           "stored_at REAL, expires_at REAL, accessed_at REAL, travel_date TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+        # caches created before entries had timestamps get their columns added and backfilled
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(cache)")}
+        missing = [column for column in _COLUMNS if column not in existing]
+        for column in missing:
+            self._conn.execute(f"ALTER TABLE cache ADD COLUMN {column} {_COLUMNS[column]}")
+        if missing:
+            self._backfill_timestamps()
+
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_travel_date ON cache (travel_date)")
+        self._conn.commit()
+
+    def _row_metadata(self, key, now):
+        travel_date = CachePolicy.travel_date(key)
+        expires_at = self.policy.expires_at(key, now) if self.policy else None
+        return now, expires_at, now, travel_date.isoformat() if travel_date else None
+
+    def _backfill_timestamps(self):
+        """Entries of unknown age are treated as stored now, the policy's TTL still bounds how long they live."""
+        now = time.time()
+        keys = [row[0] for row in self._conn.execute("SELECT key FROM cache WHERE stored_at IS NULL")]
+        self._conn.executemany("UPDATE cache SET stored_at = ?, expires_at = ?, accessed_at = ?, travel_date = ? "
+                               "WHERE key = ?", (self._row_metadata(key, now) + (key,) for key in keys))
+
+    def _visible(self, key):
+        return self.read_enabled or key in self._written
+
+    @staticmethod
+    def _fresh(expires_at, now):
+        return expires_at is None or expires_at > now
+
+    def _remember(self, key, value, expires_at):
+        self._absent.discard(key)
+        self._memo[key] = (value, expires_at)
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None, fresh_for=0):
+        """Value of a key, ``default`` when it is missing or expires within ``fresh_for`` seconds."""
+        if not self._visible(key):
+            return default
+        now = time.time()
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                value, expires_at = self._memo[key]
+            elif key in self._absent:
+                return default
+            else:
+                row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return default
+                value, expires_at = decode_value(row[0]), row[1]
+                self._remember(key, value, expires_at)
+
+            if not self._fresh(expires_at, now + fresh_for):
+                return default
+            self._accessed.add(key)
+        return value
+
+    def reload(self, key, default=None, fresh_for=0):
+        """Read a key from the file again, it may have been written by another process since it was looked up."""
+        with self._lock:
+            self._memo.pop(key, None)
+            self._absent.discard(key)
+        return self.get(key, default, fresh_for)
+
+    def prefetch(self, keys):
+        """Decode the given keys with a single indexed query, so the run's later lookups stay in memory."""
+        keys = [key for key in dict.fromkeys(keys) if self._visible(key) and key not in self._memo]
+        # stay below SQLite's default limit of host parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(f"SELECT key, value, expires_at FROM cache WHERE key IN ({placeholders})",
+                                          chunk).fetchall()
+                found = set()
+                for key, encoded, expires_at in rows:
+                    self._remember(key, decode_value(encoded), expires_at)
+                    found.add(key)
+                self._absent.update(key for key in chunk if key not in found)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def put(self, key, value, stored_at=None, force=False, slack=0.0):
+        """Store a value, ``stored_at`` dates it back to when its data was fetched for the policy's TTL.
+
+        An entry stored later than ``stored_at`` is kept unless ``force`` is set, or unless it was stored no more
+        than ``slack`` seconds later. Returns whether it was written.
+        """
+        encoded = encode_value(value)
+        metadata = self._row_metadata(key, stored_at if stored_at is not None else time.time())
+        newer_only = "" if force else " WHERE excluded.stored_at + ? >= cache.stored_at OR cache.stored_at IS NULL"
+        with self._lock:
+            written = self._conn.execute("INSERT INTO cache (key, value, stored_at, expires_at, accessed_at, "
+                                         "travel_date) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                                         "value = excluded.value, stored_at = excluded.stored_at, "
+                                         "expires_at = excluded.expires_at, accessed_at = excluded.accessed_at, "
+                                         "travel_date = excluded.travel_date" + newer_only,
+                                         (key, encoded) + metadata + (() if force else (slack,))).rowcount
+            self._written.add(key)
+            if written:
+                self._remember(key, value, metadata[1])
+            else:
+                # another process stored fresher data, the next read picks it up
+                self._memo.pop(key, None)
+                self._absent.discard(key)
+            return bool(written)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def keys(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM cache")]
+
+    def _flush_access_times(self):
+        if not self._accessed:
+            return
+        self._conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                               ((time.time(), key) for key in self._accessed))
+        self._accessed.clear()
+
+    def commit(self):
+        """Flush pending writes to disk."""
+        with self._lock:
+            self._flush_access_times()
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._flush_access_times()
+            self._conn.commit()
+            self._conn.close()
+
+    def evict(self, now=None):
+        """Remove past travel dates, expired entries and the least recently used entries above the size limit."""
+        now = now if now is not None else time.time()
+        today = datetime.fromtimestamp(now).date().isoformat()
+        with self._lock:
+            self._flush_access_times()
+            removed = self._conn.execute("DELETE FROM cache WHERE travel_date < ?", (today,)).rowcount
+            removed += self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+
+            max_entries = self.policy.max_entries if self.policy else None
+            if max_entries is not None:
+                excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - max_entries
+                if excess > 0:
+                    removed += self._conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                                                  "ORDER BY accessed_at LIMIT ?)", (excess,)).rowcount
+            self._conn.commit()
+            if removed:
+                self._memo.clear()
+        return removed
+
+    def migrate_from_json(self, json_path):
+        """Import a legacy whole-file JSON cache once, the JSON file itself is left untouched."""
+        with self._lock:
+            migrated = self._conn.execute("SELECT value FROM meta WHERE name = 'migrated_json'").fetchone()
+        if migrated or not os.path.exists(json_path):
+            return 0
+
+        # values are stored in their encoded form, so there is no need to build Trip objects here
+        with open(json_path, 'r') as file:
+            legacy_cache = json.load(file)
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO cache (key, value, stored_at, expires_at, accessed_at, "
+                                   "travel_date) VALUES (?, ?, ?, ?, ?, ?)",
+                                   ((key, json.dumps(value)) + self._row_metadata(key, now)
+                                    for key, value in legacy_cache.items()))
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('migrated_json', ?)",
+                               (os.path.abspath(json_path),))
+            self._conn.commit()
+        return len(legacy_cache)
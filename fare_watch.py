@@ -0,0 +1,104 @@
+import math
+import os
+from datetime import datetime, timedelta
+
+from cache_store import CacheStore
+from train_ticket_finder import TrainTicketFinder
+from trip_classes import TripType
+
+
+def diff_trips(previous, current):
+    """(kind, trip, previous trip) for every change between two observations of the same fare page.
+
+    Trips are compared by their own identity, so a trip equal to one seen before is unchanged. A train (same
+    departure and arrival) listed at another price is 'cheaper' or 'dearer', a train that is no longer
+    listed is 'sold_out' and one that was not listed before is 'new'.
+    """
+    previous_set, current_set = set(previous), set(current)
+    gone = {trip.departure_arrival: trip for trip in previous if trip not in current_set}
+    changes = []
+    for trip in current:
+        if trip in previous_set:
+            continue
+        before = gone.pop(trip.departure_arrival, None)
+        if before is None:
+            changes.append(('new', trip, None))
+        elif trip.cost < before.cost:
+            changes.append(('cheaper', trip, before))
+        elif trip.cost > before.cost:
+            changes.append(('dearer', trip, before))
+    changes += [('sold_out', trip, None) for trip in gone.values()]
+    return changes
+
+
+class FareWatch:
+    """Polls the fares of some routes over the next ``days`` days and reports what changed since the last poll.
+
+    Only the fare pages are fetched again, the calling points and service stop counts come from the cache, so
+    a poll costs one or two requests per date and direction. The trips of every page are kept in a state file
+    (an expiry-free CacheStore) as the previous observation to diff against, the first poll of a page only
+    records it.
+    """
+
+    def __init__(self, routes, days=14, state_path=None, **finder_options):
+        self.routes = list(routes)
+        self.days = days
+        self.finder_options = finder_options
+        self.engine = TrainTicketFinder(datetime.now(), quiet=True, **finder_options)
+        self.state = CacheStore(state_path or os.path.splitext(self.engine.cache_file)[0] + '_watch.sqlite3')
+        # past travel dates are of no more use
+        self.state.evict()
+
+    def finder(self, station_from, station_to, start):
+        # every fare in the window is fetched again, whatever its time to live
+        return TrainTicketFinder(datetime(start.year, start.month, start.day), station_from=station_from,
+                                 station_to=station_to, shared_from=self.engine, quiet=True,
+                                 date_to=start + timedelta(days=self.days), refresh_ahead=math.inf,
+                                 **self.finder_options)
+
+    def poll(self, now=None):
+        """Fetch the fares of every route again, returns the change events."""
+        now = now or datetime.now()
+        events = []
+        for station_from, station_to in self.routes:
+            finder = self.finder(station_from, station_to, now.date())
+            for travel_date, outbound_trips, return_trips in finder.iter_fares():
+                events += self._observe(station_from, station_to, TripType.OUTBOUND, travel_date, outbound_trips,
+                                        now)
+                events += self._observe(station_to, station_from, TripType.RETURN, travel_date, return_trips, now)
+        self.state.commit()
+        return events
+
+    def _observe(self, origin, destination, trip_type, travel_date, trips, now):
+        key = f"{travel_date.isoformat()}_{origin}:{destination}_{trip_type.name}"
+        previous = self.state.get(key)
+        self.state[key] = trips
+        if previous is None:
+            return []
+
+        events = []
+        for kind, trip, before in diff_trips(previous, trips):
+            # trains of today that have left are no longer listed, they are not sold out
+            if (kind == 'sold_out' and travel_date == now.date() and
+                    0 <= trip.departure_minutes < now.hour * 60 + now.minute):
+                continue
+            events.append(trip_event(kind, origin, destination, travel_date, trip, before, now))
+        return events
+
+    def close(self):
+        self.state.close()
+        self.engine.cache.close()
+
+
+def trip_event(kind, origin, destination, travel_date, trip, before, now):
+    return {
+        'event': kind,
+        'route': f"{origin}:{destination}",
+        'type': trip.type.name.lower(),
+        'date': travel_date.isoformat(),
+        'departure_arrival': trip.departure_arrival,
+        'cost': trip.cost,
+        'previous_cost': before.cost if before is not None else None,
+        'stops': trip.num_stops,
+        'observed_at': now.isoformat(timespec='seconds'),
+    }
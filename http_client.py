@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+
+from instrumentation import NULL_PROFILER
+from rate_limiter import RateLimiter
+
+# statuses the site sends when it is overloaded or throttling us, worth another try after a pause
+RETRY_STATUSES = frozenset({418, 429, 500, 502, 503, 504})
+# the site answers 418 I'm a teapot when the cookies of the first visit are missing or stale
+REPRIME_STATUSES = frozenset({418})
+
+
+class FetchError(Exception):
+    """Raised when a page could not be fetched, even after retrying."""
+    pass
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    import email.utils
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - (time.time() if now is None else now))
+
+
+class AdaptiveConcurrency:
+    """Caps the number of requests in flight, AIMD style.
+
+    Every successful request adds 1/limit to the limit, so it grows by about one per round of requests, and a
+    throttled request halves it. Requests sent before the last decrease can't halve it again, so a burst of
+    throttled responses to the same round only counts once.
+    """
+
+    def __init__(self, initial=1, minimum=1, maximum=16):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self._in_flight = 0
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot, returns the token to hand back to release."""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+            return self._epoch
+
+    def release(self, token, throttled=False):
+        with self._condition:
+            self._in_flight -= 1
+            if throttled:
+                if token == self._epoch:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._epoch += 1
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class HttpClient:
+    """Sends the finder's requests through one session with sized connection pools, timeouts and retries.
+
+    Overloaded or throttled responses and connection errors are retried after a jittered exponential backoff,
+    or after the Retry-After the site asked for, and a 418 primes the session's cookies again first. The
+    number of requests in flight adapts to how the site responds, see AdaptiveConcurrency.
+
+    Nothing is set up until the first request: without a ``session`` the requests library is only imported
+    then, and the cookies are primed then, so a run answered from the cache never touches the network. An
+    ``offline`` client refuses every request with a FetchError.
+    """
+
+    def __init__(self, session, base_url, headers=None, rate_limiter=None, profiler=None, concurrency=1,
+                 max_concurrency=None, timeout=(5, 30), max_retries=3, backoff=0.5, max_backoff=60.0,
+                 offline=False):
+        self._session = session
+        self.offline = offline
+        self.base_url = base_url
+        self.headers = headers or {}
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.profiler = profiler or NULL_PROFILER
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_concurrency = max_concurrency or concurrency * 4
+        self.concurrency = AdaptiveConcurrency(concurrency, 1, self.max_concurrency)
+        self._setup_lock = threading.RLock()
+        self._mounted = False
+        self._primed = False
+
+    @property
+    def session(self):
+        """The session, created and given its connection pools on first use."""
+        if self._mounted:
+            return self._session
+        with self._setup_lock:
+            if self._session is None:
+                import requests
+                self._session = requests.Session()
+            # one pooled connection per request that may be in flight, so parallel workers don't queue for a socket
+            if not self._mounted and hasattr(self._session, 'mount'):
+                from requests.adapters import HTTPAdapter
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency, max_retries=0)
+                self._session.mount('https://', adapter)
+                self._session.mount('http://', adapter)
+            self._mounted = True
+        return self._session
+
+    def prime(self, force=False):
+        """Visit the main page to get the cookies the site expects, a shared session is only primed once."""
+        if self._primed and not force:
+            return
+        with self._setup_lock:
+            # another thread may have primed it while this one waited for the lock
+            if (self._primed or self.session.cookies) and not force:
+                self._primed = True
+                return
+            if force:
+                self.session.cookies.clear()
+            self.rate_limiter.wait(self.base_url)
+            with self.profiler.stage('http.handshake'):
+                self.session.get(self.base_url, timeout=self.timeout)
+            self._primed = True
+
+    def _backoff_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+        # full jitter, so workers throttled together don't come back together
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method, url):
+        """Send a request, retrying throttled responses and transport errors.
+
+        Returns the response, which may still have an error status the site doesn't throttle with, and raises
+        FetchError once the retries are used up.
+        """
+        if self.offline:
+            raise FetchError(f"Not cached and offline: {url}")
+        import requests
+
+        try:
+            # First visit the main page to get cookies
+            # this is needed to avoid the 418 I'm a teapot error
+            self.prime()
+        except requests.RequestException as exc:
+            raise FetchError(f"Failed to connect to {self.base_url}: {exc}")
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            error = None
+            token = self.concurrency.acquire()
+            try:
+                self.rate_limiter.wait(url)
+                with self.profiler.stage(f'http.{method}'):
+                    response = self.session.request(method, url, headers=self.headers, timeout=self.timeout)
+            except requests.RequestException as exc:
+                error = exc
+            finally:
+                throttled = error is not None or (response is not None and response.status_code in RETRY_STATUSES)
+                self.concurrency.release(token, throttled)
+
+            if error is None:
+                self.profiler.count('requests')
+                self.profiler.count('bytes_received', len(response.content))
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                self.profiler.count(f'http.status_{response.status_code}')
+
+            if attempt == self.max_retries:
+                break
+
+            self.profiler.count('retries')
+            delay = self._backoff_delay(attempt, response)
+            # the other workers hold off the host too, instead of all of them getting throttled in turn
+            self.rate_limiter.pause(url, delay)
+            if response is not None and response.status_code in REPRIME_STATUSES:
+                self.prime(force=True)
+
+        if error is not None:
+            raise FetchError(f"Failed to fetch {url}: {error}")
+        raise FetchError(f"Failed to fetch {url}: Status code {response.status_code}")
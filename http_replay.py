@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class FixtureMissingError(LookupError):
+    """Raised when replaying a request that was never recorded."""
+    pass
+
+
+def fixture_name(method, url):
+    """File name of the fixture holding the response to a request."""
+    return hashlib.sha1(f"{method.upper()} {url}".encode('utf-8')).hexdigest() + '.json'
+
+
+class ReplayResponse:
+    """The parts of a requests.Response the finder reads."""
+
+    def __init__(self, url, status_code, text, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return self.text.encode('utf-8')
+
+
+class RecordingSession:
+    """Wraps a requests.Session and stores every response as a JSON fixture in ``directory``."""
+
+    def __init__(self, directory, session=None):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.directory = directory
+        self.session = session
+        os.makedirs(directory, exist_ok=True)
+
+    def __getattr__(self, name):
+        # cookies, headers, mount... are the wrapped session's
+        return getattr(self.session, name)
+
+    def request(self, method, url, **kwargs):
+        response = self.session.request(method, url, **kwargs)
+        fixture = {
+            'method': method.upper(),
+            'url': url,
+            'status_code': response.status_code,
+            'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+            'text': response.text,
+        }
+        path = os.path.join(self.directory, fixture_name(method, url))
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(fixture, file)
+        os.replace(path + '.tmp', path)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+class ReplaySession:
+    """Serves recorded fixtures back instead of hitting the site, after ``latency`` seconds per request."""
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+        self.cookies = {}
+        self.headers = {}
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        path = os.path.join(self.directory, fixture_name(method, url))
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                fixture = json.load(file)
+        except FileNotFoundError:
+            raise FixtureMissingError(f"No recorded response for {method.upper()} {url}")
+
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return ReplayResponse(url, fixture['status_code'], fixture['text'], fixture.get('headers'))
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Records latencies and counters of the finder's hot paths.
+
+    ``stage`` times a block under a name, ``count`` adds to a counter (requests, bytes, cache hits and misses).
+    Listeners registered with ``add_listener`` are called with ``(name, value)`` for every latency (seconds)
+    and counter increment, which is the hook for external monitoring. A disabled profiler records nothing.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counters = {}
+        self._listeners = []
+        self._started = time.perf_counter()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._latencies.setdefault(name, []).append(seconds)
+        for listener in self._listeners:
+            listener(name, seconds)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+        for listener in self._listeners:
+            listener(name, amount)
+
+    def report(self) -> dict:
+        """Summary of every stage, the counters and the hit ratio of every cache kind."""
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in self._latencies.items()}
+            counters = dict(self._counters)
+
+        stages = {}
+        for name, values in sorted(latencies.items()):
+            stages[name] = {
+                'count': len(values),
+                'total_ms': sum(values) * 1000,
+                'mean_ms': sum(values) / len(values) * 1000,
+                'p50_ms': values[len(values) // 2] * 1000,
+                'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+                'max_ms': values[-1] * 1000,
+            }
+
+        hit_ratios = {}
+        for name in counters:
+            if name.startswith('cache_hit.'):
+                kind = name[len('cache_hit.'):]
+                hits, misses = counters[name], counters.get(f'cache_miss.{kind}', 0)
+                hit_ratios[kind] = hits / (hits + misses)
+        for name in counters:
+            if name.startswith('cache_miss.') and name[len('cache_miss.'):] not in hit_ratios:
+                hit_ratios[name[len('cache_miss.'):]] = 0.0
+
+        return {
+            'wall_time_ms': (time.perf_counter() - self._started) * 1000,
+            'stages': stages,
+            'counters': dict(sorted(counters.items())),
+            'cache_hit_ratios': dict(sorted(hit_ratios.items())),
+        }
+
+    def format_table(self) -> str:
+        report = self.report()
+        lines = [f"{'stage':<28} {'count':>7} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, stage in report['stages'].items():
+            lines.append(f"{name:<28} {stage['count']:>7} {stage['total_ms']:>10.1f} {stage['mean_ms']:>9.1f} "
+                         f"{stage['p95_ms']:>9.1f} {stage['max_ms']:>9.1f}")
+        lines.append("")
+        for name, value in report['counters'].items():
+            lines.append(f"{name:<28} {value:>7}")
+        for kind, ratio in report['cache_hit_ratios'].items():
+            lines.append(f"{'hit ratio ' + kind:<28} {ratio:>7.0%}")
+        lines.append(f"{'wall time ms':<28} {report['wall_time_ms']:>7.0f}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+# used when profiling is off, so the hot paths never have to check for a profiler
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+_URL_DATE = re.compile(r'/(\d{4}-\d{2}-\d{2})(?:$|[/?])')
+
+
+class PageStore:
+    """Keeps the raw responses of the site, gzip compressed, so the trip cache can be rebuilt without the site.
+
+    Bodies are stored once under the SHA-256 of their content in ``objects/``, the same page fetched twice or
+    for two requests only takes the space once. An SQLite index maps each request (method and url, which
+    holds the travel date) to its body, and each fare cache key to the results pages its trips came from.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite3'), check_same_thread=False)
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS pages (method TEXT NOT NULL, url TEXT NOT NULL, "
+                               "digest TEXT NOT NULL, status INTEGER, kind TEXT, travel_date TEXT, fetched_at REAL, "
+                               "PRIMARY KEY (method, url))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS fares (cache_key TEXT PRIMARY KEY, trip_type TEXT, "
+                               "travel_date TEXT, origin TEXT, destination TEXT, window_start INTEGER, "
+                               "window_end INTEGER, urls TEXT, fetched_at REAL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS pages_kind ON pages (kind)")
+            self._conn.commit()
+
+    @staticmethod
+    def object_path(directory, digest):
+        return os.path.join(directory, 'objects', digest[:2], digest[2:] + '.gz')
+
+    def put(self, method, url, status_code, text, kind):
+        """Store a response body and index it under its request, returns the digest of the body."""
+        body = text.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(self.directory, digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside and renamed, so a concurrent reader never sees half a file
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(temp_path, 'wb') as file:
+                file.write(body)
+            os.replace(temp_path, path)
+
+        match = _URL_DATE.search(url)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO pages (method, url, digest, status, kind, travel_date, "
+                               "fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (method.upper(), url, digest, status_code, kind, match.group(1) if match else None,
+                                time.time()))
+            self._conn.commit()
+        return digest
+
+    def link_fare(self, cache_key, trip_type, travel_date, origin, destination, window, urls):
+        """Record the results pages the trips of a fare cache key were parsed from."""
+        window_start, window_end = window if window else (None, None)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO fares (cache_key, trip_type, travel_date, origin, destination, "
+                               "window_start, window_end, urls, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                               (cache_key, trip_type, travel_date.isoformat(), origin, destination, window_start,
+                                window_end, '\n'.join(dict.fromkeys(urls)), time.time()))
+            self._conn.commit()
+
+    @staticmethod
+    def read(directory, digest):
+        """Body of a stored page, a static method so worker processes don't need the index."""
+        with gzip.open(PageStore.object_path(directory, digest), 'rb') as file:
+            return file.read().decode('utf-8')
+
+    def get(self, method, url):
+        """Body stored for a request, None if it was never stored."""
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM pages WHERE method = ? AND url = ?",
+                                     (method.upper(), url)).fetchone()
+        return self.read(self.directory, row[0]) if row else None
+
+    def pages(self, kind):
+        """(url, digest, fetched_at) of every stored page of a kind."""
+        with self._lock:
+            return self._conn.execute("SELECT url, digest, fetched_at FROM pages WHERE kind = ?", (kind,)).fetchall()
+
+    def fares(self):
+        """Every recorded fare cache key as a dict of its columns, with the digests of its pages."""
+        with self._lock:
+            rows = self._conn.execute("SELECT cache_key, trip_type, travel_date, origin, destination, window_start, "
+                                      "window_end, urls, fetched_at FROM fares").fetchall()
+            digests = dict(self._conn.execute("SELECT url, digest FROM pages WHERE kind = 'results'").fetchall())
+
+        fares = []
+        for cache_key, trip_type, travel_date, origin, destination, window_start, window_end, urls, fetched_at in rows:
+            urls = urls.split('\n') if urls else []
+            fares.append({
+                'cache_key': cache_key,
+                'trip_type': trip_type,
+                'travel_date': travel_date,
+                'origin': origin,
+                'destination': destination,
+                'window': (window_start, window_end) if window_start is not None else None,
+                'pages': [(url, digests.get(url)) for url in urls],
+                'fetched_at': fetched_at,
+            })
+        return fares
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
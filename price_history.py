@@ -0,0 +1,178 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+MAGIC = b'PHS1'
+_HEADER = struct.Struct('<II')  # row count, length of the route table
+
+# (name, array typecode) of each column, in the order they are stored in a segment
+COLUMNS = (
+    ('route', 'H'),             # index into the route table
+    ('trip_type', 'B'),         # TripType value
+    ('travel_date', 'I'),       # date ordinal
+    ('departure', 'h'),         # minutes after midnight, -1 if unknown
+    ('cost', 'd'),
+    ('travel_minutes', 'H'),
+    ('stops', 'H'),
+    ('observed_at', 'd'),       # unix time the fare was fetched
+)
+_NUMPY_TYPES = {'H': '<u2', 'B': 'u1', 'I': '<u4', 'h': '<i2', 'd': '<f8'}
+
+
+def _numpy():
+    """numpy if it is installed, the history works with plain arrays otherwise."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class PriceHistory:
+    """Append-only, columnar record of every fare observed, for analysis across refreshes of the cache.
+
+    Observations are buffered and written as a segment file holding one block per column, a segment is
+    written aside and renamed so concurrent runs never see or produce half a segment and need no lock.
+    ``load`` concatenates the segments into one array per column, numpy arrays when numpy is installed so
+    price_queries can aggregate millions of rows at once, ``compact`` merges the segments into one.
+    """
+
+    def __init__(self, directory, flush_rows=10_000):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._buffer = {name: array(typecode) for name, typecode in COLUMNS}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def route_name(origin, destination):
+        return f"{origin}:{destination}"
+
+    def append(self, origin, destination, trips, observed_at=None):
+        """Record the trips of one fetch of a route."""
+        observed_at = observed_at if observed_at is not None else time.time()
+        with self._lock:
+            route = self._routes.setdefault(self.route_name(origin, destination), len(self._routes))
+            for trip in trips:
+                self._buffer['route'].append(route)
+                self._buffer['trip_type'].append(trip.type.value)
+                self._buffer['travel_date'].append(trip.date_ordinal)
+                self._buffer['departure'].append(trip.departure_minutes)
+                self._buffer['cost'].append(trip.cost)
+                self._buffer['travel_minutes'].append(trip.travel_time_minutes)
+                self._buffer['stops'].append(trip.num_stops)
+                self._buffer['observed_at'].append(observed_at)
+            full = len(self._buffer['route']) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered observations as a new segment."""
+        with self._lock:
+            buffer, routes = self._buffer, self._routes
+            self._buffer = {name: array(typecode) for name, typecode in COLUMNS}
+            self._routes = {}
+        if buffer['route']:
+            self._write_segment(buffer, list(routes))
+
+    def _write_segment(self, columns, routes):
+        route_table = json.dumps(routes).encode('utf-8')
+        name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}.seg"
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(MAGIC)
+            file.write(_HEADER.pack(len(columns['route']), len(route_table)))
+            file.write(route_table)
+            for column_name, typecode in COLUMNS:
+                column = columns[column_name]
+                # segments are little endian whatever wrote them
+                if column.itemsize > 1 and sys.byteorder != 'little':
+                    column = array(typecode, column)
+                    column.byteswap()
+                file.write(column.tobytes())
+        os.replace(path + '.tmp', path)
+        return path
+
+    def segments(self):
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if name.endswith('.seg'))
+
+    @staticmethod
+    def _read_segment(path, numpy=None):
+        with open(path, 'rb') as file:
+            data = file.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a price history segment")
+        offset = len(MAGIC)
+        rows, route_table_length = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+        routes = json.loads(data[offset:offset + route_table_length].decode('utf-8'))
+        offset += route_table_length
+
+        columns = {}
+        for name, typecode in COLUMNS:
+            if numpy is not None:
+                column = numpy.frombuffer(data, dtype=_NUMPY_TYPES[typecode], count=rows, offset=offset)
+                size = column.nbytes
+            else:
+                column = array(typecode)
+                size = column.itemsize * rows
+                column.frombytes(data[offset:offset + size])
+                if column.itemsize > 1 and sys.byteorder != 'little':
+                    column.byteswap()
+            columns[name] = column
+            offset += size
+        return routes, columns
+
+    def load(self, use_numpy=True, segments=None):
+        """Return (routes, columns): the route names and one array per column, over every segment.
+
+        Route codes are renumbered from each segment's own table to the returned ``routes`` list.
+        """
+        numpy = _numpy() if use_numpy else None
+        routes = {}
+        parts = {name: [] for name, _ in COLUMNS}
+        for path in segments if segments is not None else self.segments():
+            segment_routes, columns = self._read_segment(path, numpy)
+            codes = [routes.setdefault(route, len(routes)) for route in segment_routes]
+            if numpy is not None:
+                columns['route'] = numpy.asarray(codes, dtype='<u2')[columns['route']]
+            else:
+                columns['route'] = array('H', (codes[code] for code in columns['route']))
+            for name, _ in COLUMNS:
+                parts[name].append(columns[name])
+
+        loaded = {}
+        for name, typecode in COLUMNS:
+            if numpy is not None:
+                loaded[name] = (numpy.concatenate(parts[name]) if parts[name]
+                                else numpy.empty(0, dtype=_NUMPY_TYPES[typecode]))
+            else:
+                loaded[name] = array(typecode)
+                for part in parts[name]:
+                    loaded[name].extend(part)
+        return list(routes), loaded
+
+    def compact(self):
+        """Merge every segment into a single one, returns the number of segments merged."""
+        segments = self.segments()
+        if len(segments) < 2:
+            return 0
+        # a segment written meanwhile by another run is left for the next compaction
+        routes, columns = self.load(use_numpy=False, segments=segments)
+        self._write_segment(columns, routes)
+        for path in segments:
+            os.remove(path)
+        return len(segments)
+
+    def __len__(self):
+        total = 0
+        for path in self.segments():
+            with open(path, 'rb') as file:
+                total += _HEADER.unpack(file.read(len(MAGIC) + _HEADER.size)[len(MAGIC):])[0]
+        return total
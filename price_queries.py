@@ -0,0 +1,101 @@
+from datetime import date
+
+from util_functions import WEEKDAY_NAMES
+
+# date(1970, 1, 1).toordinal(), to turn unix times into date ordinals
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_DAY = 24 * 60 * 60
+
+# Every query takes the columns returned by PriceHistory.load: numpy arrays are aggregated in a few vectorized
+# passes, plain arrays (numpy is not installed) with a loop giving the same answer.
+
+
+def _is_numpy(columns):
+    return hasattr(columns['cost'], 'dtype')
+
+
+def select(routes, columns, route=None, trip_type=None):
+    """The rows of one route (FROM:TO) and/or trip type."""
+    if route is None and trip_type is None:
+        return columns
+    route_code = routes.index(route) if route in routes else -1
+    if _is_numpy(columns):
+        import numpy
+        mask = numpy.ones(len(columns['cost']), dtype=bool)
+        if route is not None:
+            mask &= columns['route'] == route_code
+        if trip_type is not None:
+            mask &= columns['trip_type'] == trip_type.value
+        return {name: column[mask] for name, column in columns.items()}
+
+    rows = [row for row in range(len(columns['cost']))
+            if (route is None or columns['route'][row] == route_code)
+            and (trip_type is None or columns['trip_type'][row] == trip_type.value)]
+    return {name: type(column)(column.typecode, (column[row] for row in rows)) for name, column in columns.items()}
+
+
+def cheapest_by_weekday(columns):
+    """Cheapest fare seen for each weekday of travel, across every month recorded."""
+    if _is_numpy(columns):
+        import numpy
+        weekdays = (columns['travel_date'].astype('i8') + 6) % 7
+        cheapest = numpy.full(7, numpy.inf)
+        numpy.minimum.at(cheapest, weekdays, columns['cost'])
+        return {WEEKDAY_NAMES[weekday]: float(cheapest[weekday]) for weekday in range(7)
+                if numpy.isfinite(cheapest[weekday])}
+
+    cheapest = {}
+    for travel_date, cost in zip(columns['travel_date'], columns['cost']):
+        weekday = WEEKDAY_NAMES[(travel_date + 6) % 7]
+        if weekday not in cheapest or cost < cheapest[weekday]:
+            cheapest[weekday] = cost
+    return {weekday: cheapest[weekday] for weekday in WEEKDAY_NAMES if weekday in cheapest}
+
+
+def price_by_days_before(columns, bucket_days=7):
+    """(days before travel, observations, mean fare, cheapest fare) per bucket of days, nearest first.
+
+    Days before travel count from the UTC date the fare was observed on.
+    """
+    if _is_numpy(columns):
+        import numpy
+        observed = (columns['observed_at'] // _DAY).astype('i8') + _EPOCH_ORDINAL
+        days_before = columns['travel_date'].astype('i8') - observed
+        ahead = days_before >= 0
+        buckets, inverse = numpy.unique(days_before[ahead] // bucket_days, return_inverse=True)
+        costs = columns['cost'][ahead]
+        counts = numpy.bincount(inverse, minlength=len(buckets))
+        sums = numpy.bincount(inverse, weights=costs, minlength=len(buckets))
+        cheapest = numpy.full(len(buckets), numpy.inf)
+        numpy.minimum.at(cheapest, inverse, costs)
+        return [(int(bucket) * bucket_days, int(count), float(total / count), float(low))
+                for bucket, count, total, low in zip(buckets, counts, sums, cheapest)]
+
+    totals = {}
+    for travel_date, observed_at, cost in zip(columns['travel_date'], columns['observed_at'], columns['cost']):
+        days_before = travel_date - (int(observed_at // _DAY) + _EPOCH_ORDINAL)
+        if days_before < 0:
+            continue
+        count, total, low = totals.get(days_before // bucket_days, (0, 0.0, cost))
+        totals[days_before // bucket_days] = (count + 1, total + cost, min(low, cost))
+    return [(bucket * bucket_days, count, total / count, low)
+            for bucket, (count, total, low) in sorted(totals.items())]
+
+
+def fare_percentiles(columns, percentiles=(10, 25, 50, 75, 90)):
+    """Fare at each percentile, linearly interpolated between the closest observations."""
+    costs = columns['cost']
+    if not len(costs):
+        return {}
+    if _is_numpy(columns):
+        import numpy
+        return dict(zip(percentiles, (float(value) for value in numpy.percentile(costs, percentiles))))
+
+    ordered = sorted(costs)
+    result = {}
+    for percentile in percentiles:
+        position = (len(ordered) - 1) * percentile / 100
+        lower = int(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        result[percentile] = ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+    return result
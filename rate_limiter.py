@@ -0,0 +1,32 @@
+import threading
+import time
+import urllib.parse
+
+
+class RateLimiter:
+    """Spaces out requests to the same host so concurrent workers share a single request budget."""
+
+    def __init__(self, requests_per_second=0.0):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second and requests_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        """Block until the host of the given url may receive another request."""
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            if self.min_interval or slot > now:
+                self._next_slot[host] = slot + self.min_interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, url, seconds):
+        """Hold off every request to the host of the given url for the next ``seconds``."""
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            resume = time.monotonic() + seconds
+            self._next_slot[host] = max(resume, self._next_slot.get(host, resume))
@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from page_store import PageStore
+from result_parser import PAGE_PARSERS, count_calling_points, service_key
+from trip_classes import TripType
+
+BASE_URL = "https://traintimes.org.uk"
+# the finder caches an entry right after fetching its pages, one stored later than this came from a newer fetch
+STORED_WITH_PAGES_SLACK = 10 * 60
+
+
+def _count_stops_job(job):
+    directory, url, digest = job
+    return url, count_calling_points(PageStore.read(directory, digest))
+
+
+def _fare_candidates_job(job):
+    """Parse the results pages of a fare cache key into candidates, None when they can't be rebuilt."""
+    directory, fare, parser, no_changes = job
+    trip_type = TripType[fare['trip_type']]
+    trip_date = date.fromisoformat(fare['travel_date'])
+
+    candidates = []
+    for url, digest in fare['pages']:
+        if digest is None:
+            return None
+        page = PAGE_PARSERS[parser].from_html(PageStore.read(directory, digest), BASE_URL, no_changes)
+        if page.is_too_far():
+            return None
+        candidates += page.trip_candidates(trip_type, trip_date)
+
+    if fare['window']:
+        start, end = fare['window']
+        candidates = [candidate for candidate in candidates if start <= candidate[0].departure_minutes <= end]
+    # overlapping pages list the same train more than once
+    return list({trip: (trip, stops_url, has_price) for trip, stops_url, has_price in candidates}.values())
+
+
+def resolve_trips(candidates, fare, stop_counts, cache, max_stops):
+    """Fill in the stops of the candidates like the finder does, None if a count or a price is missing."""
+    trip_date = date.fromisoformat(fare['travel_date'])
+    trips = []
+    for trip, stops_url, has_price in candidates:
+        num_stops = 0
+        if stops_url:
+            num_stops = stop_counts.get(stops_url)
+            if num_stops is None:
+                num_stops = cache.get(f"stops_{stops_url}")
+            if num_stops is None:
+                key = service_key(trip, trip_date, fare['origin'], fare['destination'])
+                num_stops = cache.get(key) if key else None
+            if num_stops is None:
+                return None
+
+        # Skip this train if it has too many stops
+        if num_stops > max_stops:
+            continue
+        if not has_price:
+            return None
+
+        trip.num_stops = num_stops
+        trips.append(trip)
+    return trips
+
+
+def _expired(cache, key, fetched_at, now):
+    """Whether an entry of pages fetched at ``fetched_at`` would already be expired by the cache's policy."""
+    expires_at = cache.policy.expires_at(key, fetched_at) if cache.policy else None
+    return expires_at is not None and expires_at <= now
+
+
+def reparse_pages(page_store: PageStore, cache, max_stops=4, no_changes=True, parser='soup', workers=None):
+    """Rebuild the stops and fare entries of the cache from the stored pages, without sending any request.
+
+    Pages are parsed on a pool of processes, one per core unless ``workers`` says otherwise, and every entry
+    keeps the time its pages were fetched so the cache policy ages it as before. Rebuilt entries replace the
+    ones cached from the same pages, as the point is to apply a parser change, but not those stored well after
+    them from a newer fetch. Returns (rebuilt, skipped) fare entries, an entry is skipped when one of its pages,
+    calling points or prices is missing, when its pages are too old for the policy to keep it, or when a newer
+    entry is cached.
+    """
+    directory = page_store.directory
+    now = time.time()
+    rebuilt = skipped = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        calling_pages = page_store.pages('calling')
+        stop_counts = {}
+        jobs = [(directory, url, digest) for url, digest, _ in calling_pages]
+        for (url, _, fetched_at), (_, num_stops) in zip(calling_pages,
+                                                        executor.map(_count_stops_job, jobs, chunksize=32)):
+            if num_stops is not None:
+                stop_counts[url] = num_stops
+                if not _expired(cache, f"stops_{url}", fetched_at, now):
+                    cache.put(f"stops_{url}", num_stops, fetched_at, slack=STORED_WITH_PAGES_SLACK)
+
+        fares = page_store.fares()
+        jobs = [(directory, fare, parser, no_changes) for fare in fares]
+        for fare, candidates in zip(fares, executor.map(_fare_candidates_job, jobs, chunksize=8)):
+            trips = resolve_trips(candidates, fare, stop_counts, cache, max_stops) if candidates is not None else None
+            if trips is None or _expired(cache, fare['cache_key'], fare['fetched_at'], now):
+                skipped += 1
+                continue
+            if cache.put(fare['cache_key'], trips, fare['fetched_at'], slack=STORED_WITH_PAGES_SLACK):
+                rebuilt += 1
+            else:
+                skipped += 1
+
+    cache.commit()
+    return rebuilt, skipped
@@ -0,0 +1,196 @@
+import re
+import urllib.parse
+
+from trip_classes import Trip
+
+RESULT_ID_PATTERN = re.compile(r'^result\d+$')
+JOURNEY_TIME_PATTERN = re.compile(r'(\d+h\s+\d+m)')
+HOURS_PATTERN = re.compile(r'(\d+)h')
+MINUTES_PATTERN = re.compile(r'(\d+)m')
+ADVANCE_SINGLE_PATTERN = re.compile(r'£(\d+\.\d+) Advance Single')
+SINGLE_PATTERN = re.compile(r'£(\d+\.\d+) Single')
+# departure and arrival times in the result's "10:34 – 12:41" text
+SERVICE_TIMES_PATTERN = re.compile(r'\b(\d{1,2}:\d{2})\b')
+
+
+def _has_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+def parse_journey_time(text):
+    """Return (journey time string, minutes) for the first "2h 3m" pattern in text, or None."""
+    journey_time_match = JOURNEY_TIME_PATTERN.search(text)
+    if not journey_time_match:
+        return None
+
+    journey_time = journey_time_match.group(1)
+    hours, minutes = 0, 0
+    if 'h' in journey_time:
+        hours = int(HOURS_PATTERN.search(journey_time).group(1))
+    if 'm' in journey_time:
+        minutes = int(MINUTES_PATTERN.search(journey_time).group(1))
+    return journey_time, hours * 60 + minutes
+
+
+def parse_price(text):
+    """Return the Advance Single price, falling back to the Single price, or None when there's no price yet."""
+    match = ADVANCE_SINGLE_PATTERN.search(text) or SINGLE_PATTERN.search(text)
+    return float(match.group(1)) if match else None
+
+
+def new_trip(trip_type, trip_date, departure_arrival, small_text):
+    """Build a trip from the text of a result item, returns (trip, has_price)."""
+    trip = Trip(
+        type=trip_type,
+        cost=0.0,
+        travel_time_str="",
+        departure_arrival=departure_arrival,
+        travel_time_minutes=0,
+        date=trip_date.strftime("%B %d, %Y"),  # format: May 25, 2025
+        num_stops=0  # resolved later in batch
+    )
+
+    journey_time = parse_journey_time(small_text)
+    if journey_time:
+        trip.travel_time_str, trip.travel_time_minutes = journey_time
+    else:
+        print("Journey time not found")
+
+    cost = parse_price(small_text)
+    if cost is not None:
+        trip.cost = cost
+    return trip, cost is not None
+
+
+def count_calling_points(html_text):
+    """Number of rows in the calling points table of a train, None when the page has no such table."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html_text, 'html.parser')
+    # Look for table rows in the calling points table, excluding header row
+    stop_rows = soup.find('tbody')
+    return len(stop_rows.find_all('tr')) if stop_rows is not None else None
+
+
+def service_key(trip, trip_date, origin, destination):
+    """Cache key of the timetabled service a trip runs on, the same train on another week shares it."""
+    times = SERVICE_TIMES_PATTERN.findall(trip.departure_arrival)
+    if len(times) < 2:
+        return None
+
+    # timetables differ between weekdays, saturdays and sundays
+    day_type = ('weekday', 'weekday', 'weekday', 'weekday', 'weekday', 'saturday', 'sunday')[trip_date.weekday()]
+    return f"service_{origin}_{destination}_{times[0]}-{times[-1]}_{day_type}"
+
+
+class SoupResultPage:
+    """Result page backed by a full BeautifulSoup tree, the original parsing path."""
+
+    def __init__(self, soup, base_url, no_changes=True, debug=False):
+        self.soup = soup
+        self.base_url = base_url
+        self.no_changes = no_changes
+        self.debug = debug
+
+    @classmethod
+    def from_html(cls, html_text, base_url, no_changes=True, debug=False):
+        from bs4 import BeautifulSoup
+        return cls(BeautifulSoup(html_text, 'lxml'), base_url, no_changes, debug)
+
+    def is_too_far(self):
+        return self.soup.find('p', class_='error-message') is not None
+
+    def link(self, data_type):
+        anchor = self.soup.find('a', {'data-type': data_type})
+        return anchor.get('href') if anchor else None
+
+    def trip_candidates(self, trip_type, trip_date) -> [tuple]:
+        """Parse the result items into (trip, stops_url, has_price) tuples, without fetching stops."""
+        candidates = []
+
+        if self.soup.find('div', id='warning'):
+            return candidates
+
+        for result in self.soup.find_all('li', id=RESULT_ID_PATTERN):
+
+            if self.debug:
+                # Print the HTML of each found element
+                print(f"Result {result.get('id')}:\n{result.prettify()}\n")
+
+            if result.find('a', class_='change_link') and self.no_changes:
+                continue
+
+            # Find the calling points link, stops are resolved for the whole batch later
+            calling_link = result.find('a', class_="calling_link")
+            stops_url = urllib.parse.urljoin(self.base_url, calling_link.get('href')) if calling_link else None
+
+            # Extract the time
+            time_element = result.find('strong')
+            departure_arrival = time_element.get_text().strip() if time_element else "Unknown"
+
+            trip, has_price = new_trip(trip_type, trip_date, departure_arrival, result.find('small').get_text())
+            candidates.append((trip, stops_url, has_price))
+
+        return candidates
+
+
+class FastResultPage:
+    """Result page parsed straight into an lxml tree and queried with XPath.
+
+    It only reads the result items, their fare text, times and links, and produces the same trips as
+    SoupResultPage at a fraction of the parse cost.
+    """
+
+    def __init__(self, html_text, base_url, no_changes=True, debug=False):
+        from lxml import html as lxml_html
+        self._lxml_html = lxml_html
+        self.root = lxml_html.document_fromstring(html_text or "<html></html>")
+        self.base_url = base_url
+        self.no_changes = no_changes
+        self.debug = debug
+
+    @classmethod
+    def from_html(cls, html_text, base_url, no_changes=True, debug=False):
+        return cls(html_text, base_url, no_changes, debug)
+
+    def is_too_far(self):
+        return bool(self.root.xpath(f"//p[{_has_class('error-message')}]"))
+
+    def link(self, data_type):
+        hrefs = self.root.xpath("//a[@data-type=$data_type]/@href", data_type=data_type)
+        return hrefs[0] if hrefs else None
+
+    def trip_candidates(self, trip_type, trip_date) -> [tuple]:
+        """Parse the result items into (trip, stops_url, has_price) tuples, without fetching stops."""
+        candidates = []
+
+        if self.root.xpath("//div[@id='warning']"):
+            return candidates
+
+        for result in self.root.xpath("//li[starts-with(@id, 'result')]"):
+            if not RESULT_ID_PATTERN.match(result.get('id')):
+                continue
+
+            if self.debug:
+                print(f"Result {result.get('id')}:\n"
+                      f"{self._lxml_html.tostring(result, pretty_print=True, encoding='unicode')}\n")
+
+            if self.no_changes and result.xpath(f".//a[{_has_class('change_link')}]"):
+                continue
+
+            hrefs = result.xpath(f".//a[{_has_class('calling_link')}]/@href")
+            stops_url = urllib.parse.urljoin(self.base_url, hrefs[0]) if hrefs else None
+
+            time_elements = result.xpath(".//strong")
+            departure_arrival = time_elements[0].text_content().strip() if time_elements else "Unknown"
+
+            trip, has_price = new_trip(trip_type, trip_date, departure_arrival,
+                                       result.xpath(".//small")[0].text_content())
+            candidates.append((trip, stops_url, has_price))
+
+        return candidates
+
+
+PAGE_PARSERS = {
+    'soup': SoupResultPage,
+    'fast': FastResultPage,
+}
@@ -0,0 +1,111 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Dict, List
+
+from train_ticket_finder import TrainTicketFinder
+from trip_classes import Results
+
+_ROUTE_SPEC = re.compile(r'^(?P<station_from>[^:]+):(?P<station_to>[^:]+)'
+                         r'(?::(?P<first>\d{4}-\d{1,2})(?:\.\.(?P<last>\d{4}-\d{1,2}))?)?$')
+
+
+@dataclass(frozen=True)
+class Route:
+    station_from: str
+    station_to: str
+    # first day searched, the search covers whole months from here up to last_month
+    start: datetime
+    last_month: datetime = None
+
+    @property
+    def name(self):
+        return f"{self.station_from}:{self.station_to}"
+
+    def month_starts(self) -> List[datetime]:
+        """First day searched in each month of the route's range."""
+        starts = [self.start]
+        last_month = self.last_month or self.start
+        year, month = self.start.year, self.start.month
+        while (year, month) < (last_month.year, last_month.month):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            starts.append(datetime(year, month, 1))
+        return starts
+
+
+def parse_route(spec: str, default_start: datetime) -> Route:
+    """Parse FROM:TO, FROM:TO:YYYY-MM or FROM:TO:YYYY-MM..YYYY-MM into a Route."""
+    match = _ROUTE_SPEC.match(spec.strip())
+    if not match:
+        raise ValueError(f"Invalid route '{spec}', expected FROM:TO[:YYYY-MM[..YYYY-MM]]")
+
+    start = default_start
+    last_month = None
+    if match.group('first'):
+        year, month = map(int, match.group('first').split('-'))
+        start = datetime(year, month, 1)
+    if match.group('last'):
+        year, month = map(int, match.group('last').split('-'))
+        last_month = datetime(year, month, 1)
+    return Route(match.group('station_from'), match.group('station_to'), start, last_month)
+
+
+def merge_results(results: List[Results]) -> Results:
+    merged = Results(same_day_tuesday=[], same_day_wednesday=[], overnight_stays=[])
+    for result in results:
+        for result_field in fields(Results):
+            getattr(merged, result_field.name).extend(getattr(result, result_field.name))
+    return merged
+
+
+class RouteMatrix:
+    """Searches many routes at once with a single session, cache, rate limit and date scheduler.
+
+    The cookie handshake happens once, every date of every route is fetched through the same pool of
+    ``workers`` threads, and identical requests from different routes (calling points in particular) are only
+    sent once, the other routes wait for the result or find it in the cache.
+    """
+
+    def __init__(self, routes: List[Route], workers=4, rate_limit=0.0, no_changes=True, disable_cache=False,
+                 max_stops=4, debug_trips=False, parser='soup', session=None, weekdays=(1, 2), max_nights=1,
+                 profiler=None, cache_path=None, history=None, offline=False, outbound_window=None,
+                 return_window=None, window_step=180, timeout=30.0, max_retries=3, page_store=None):
+        self.routes = routes
+        self.workers = max(1, workers)
+        self.finder_options = dict(no_changes=no_changes, disable_cache=disable_cache, max_stops=max_stops,
+                                   debug_trips=debug_trips, workers=self.workers, parser=parser,
+                                   weekdays=weekdays, max_nights=max_nights, profiler=profiler,
+                                   cache_path=cache_path, history=history, offline=offline,
+                                   outbound_window=outbound_window, return_window=return_window,
+                                   window_step=window_step, timeout=timeout, max_retries=max_retries,
+                                   page_store=page_store)
+        self.rate_limit = rate_limit
+        self.session = session
+
+    def search(self, max_cost=None) -> Dict[str, Results]:
+        """Return the Results of every route, keyed by route name (FROM:TO).
+
+        With ``max_cost`` each route and month stops its scan once a return trip costs no more than that.
+        """
+        jobs = [(route, month_start) for route in self.routes for month_start in route.month_starts()]
+        if not jobs:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as date_executor:
+            finders = []
+            for route, month_start in jobs:
+                shared_from = finders[0] if finders else None
+                finders.append(TrainTicketFinder(month_start, station_from=route.station_from,
+                                                 station_to=route.station_to, rate_limit=self.rate_limit,
+                                                 session=self.session, shared_from=shared_from,
+                                                 executor=date_executor, **self.finder_options))
+
+            # each route waits on its own thread while its dates run on the shared date executor
+            with ThreadPoolExecutor(max_workers=len(finders)) as route_executor:
+                route_results = list(route_executor.map(lambda finder: finder.fetch_trip_data(max_cost), finders))
+
+        results = {}
+        for (route, _), result in zip(jobs, route_results):
+            results.setdefault(route.name, []).append(result)
+        return {name: merge_results(month_results) for name, month_results in results.items()}
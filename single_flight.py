@@ -0,0 +1,32 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Runs a call at most once per key at a time, concurrent callers with the same key share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._calls[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = function(*args)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
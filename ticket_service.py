@@ -0,0 +1,211 @@
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import util_functions
+from train_ticket_finder import TrainTicketFinder
+from trip_classes import Results
+
+# longest date range a single query may ask for
+MAX_QUERY_DAYS = 366
+
+
+def trip_to_dict(trip):
+    return {
+        'date': trip.date,
+        'departure_arrival': trip.departure_arrival,
+        'cost': trip.cost,
+        'travel_time': trip.travel_time_str,
+        'travel_minutes': trip.travel_time_minutes,
+        'stops': trip.num_stops,
+    }
+
+
+def results_to_dict(results: Results):
+    """Results as plain JSON, one list of {cost, outbound, return} per kind of result."""
+    return {result_field.name: [{'cost': trips.cost(), 'outbound': trip_to_dict(trips.outbound),
+                                 'return': trip_to_dict(trips.return_trip)}
+                                for trips in getattr(results, result_field.name)]
+            for result_field in fields(Results)}
+
+
+class TicketService:
+    """Answers queries from one warm finder engine, instead of a cold process per query.
+
+    The engine's cache, connection pool, cookies and rate limit stay open for the life of the service. Every
+    query gets its own finder sharing them through ``shared_from``, its dates run on one pool of ``workers``
+    threads, so a route whose fares are cached is answered from memory. A background thread refreshes the
+    next ``refresh_days`` days of every route queried (or given up front) every ``refresh_interval`` seconds,
+    fetching again the fares that would expire before its next pass, so clients keep finding them cached.
+    """
+
+    def __init__(self, workers=4, rate_limit=0.0, session=None, routes=(), refresh_days=14, refresh_interval=900,
+                 **finder_options):
+        self.workers = max(1, workers)
+        self.refresh_days = refresh_days
+        self.refresh_interval = refresh_interval
+        self.finder_options = finder_options
+        self.engine = TrainTicketFinder(datetime.now(), rate_limit=rate_limit, session=session, workers=self.workers,
+                                        quiet=True, **finder_options)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._lock = threading.Lock()
+        # (station_from, station_to) of every route to keep fresh
+        self._routes = dict.fromkeys(routes)
+        self._stop = threading.Event()
+        self._refresh_thread = None
+        self.last_refresh = None
+
+    def finder(self, station_from, station_to, start, end, refresh_ahead=0, **options):
+        return TrainTicketFinder(datetime(start.year, start.month, start.day), station_from=station_from,
+                                 station_to=station_to, shared_from=self.engine, executor=self.executor,
+                                 workers=self.workers, date_to=end, quiet=True, refresh_ahead=refresh_ahead,
+                                 **dict(self.finder_options, **options))
+
+    def query(self, station_from, station_to, start, end, **options) -> Results:
+        """Results of a route between two dates, ``options`` override the service's (weekdays, max_nights)."""
+        if end < start:
+            raise ValueError(f"The range ends on {end} before it starts on {start}")
+        if (end - start).days > MAX_QUERY_DAYS:
+            raise ValueError(f"Ranges are limited to {MAX_QUERY_DAYS} days")
+        with self._lock:
+            self._routes.setdefault((station_from, station_to))
+        return self.finder(station_from, station_to, start, end, **options).fetch_trip_data()
+
+    def refresh(self):
+        """Fetch again the near-term fares of every route that expire before the next refresh."""
+        with self._lock:
+            routes = list(self._routes)
+        today = date.today()
+        for station_from, station_to in routes:
+            if self._stop.is_set():
+                return
+            finder = self.finder(station_from, station_to, today, today + timedelta(days=self.refresh_days),
+                                 refresh_ahead=self.refresh_interval + 60)
+            try:
+                finder.fetch_trip_data()
+            except Exception as exc:
+                # the next pass tries again, the service keeps answering from the cache meanwhile
+                print(f"Failed to refresh {station_from}:{station_to}: {exc}")
+        self.last_refresh = time.time()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.refresh_interval)
+
+    def start(self):
+        """Start refreshing in the background."""
+        if self._refresh_thread is None and self.refresh_interval > 0:
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name='refresh', daemon=True)
+            self._refresh_thread.start()
+
+    def status(self):
+        with self._lock:
+            routes = [f"{station_from}:{station_to}" for station_from, station_to in self._routes]
+        return {
+            'routes': routes,
+            'last_refresh': datetime.fromtimestamp(self.last_refresh).isoformat() if self.last_refresh else None,
+            'refresh_days': self.refresh_days,
+            'refresh_interval': self.refresh_interval,
+        }
+
+    def close(self):
+        self._stop.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+        self.executor.shutdown(wait=True)
+        if self.engine.history is not None:
+            self.engine.history.flush()
+        self.engine.cache.close()
+
+
+def _parse_query(params):
+    """Keyword arguments of TicketService.query from the query string of a /results request."""
+    def param(name, default=None):
+        return params[name][-1] if name in params else default
+
+    if not param('from') or not param('to'):
+        raise ValueError("from and to stations are required")
+    start = date.fromisoformat(param('start', date.today().isoformat()))
+    end = date.fromisoformat(param('end', (start + timedelta(days=30)).isoformat()))
+    options = {}
+    if param('weekdays'):
+        try:
+            options['weekdays'] = util_functions.parse_weekdays(param('weekdays'))
+        except argparse.ArgumentTypeError as exc:
+            raise ValueError(str(exc))
+    if param('max_nights'):
+        options['max_nights'] = int(param('max_nights'))
+        if options['max_nights'] < 0:
+            raise ValueError("max_nights can't be negative")
+    return dict(station_from=param('from'), station_to=param('to'), start=start, end=end, **options)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """GET /results?from=STATION&to=STATION[&start=YYYY-MM-DD][&end=YYYY-MM-DD][&weekdays=tue,wed][&max_nights=N]
+    and GET /status, answered as JSON.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == '/status':
+            self._send_json(200, service.status())
+        elif url.path == '/results':
+            try:
+                query = _parse_query(parse_qs(url.query))
+                started = time.perf_counter()
+                results = service.query(**query)
+            except ValueError as exc:
+                # _parse_query and query raise ValueError for anything wrong with the query itself
+                self._send_json(400, {'error': str(exc)})
+                return
+            except Exception as exc:
+                # a busy cache, a missing replay fixture or a bug, the client still gets an answer
+                self.log_error("Query %s failed: %r", self.path, exc)
+                self._send_json(500, {'error': f"{type(exc).__name__}: {exc}"})
+                return
+            self._send_json(200, {
+                'route': f"{query['station_from']}:{query['station_to']}",
+                'start': query['start'].isoformat(),
+                'end': query['end'].isoformat(),
+                'seconds': round(time.perf_counter() - started, 3),
+                'results': results_to_dict(results),
+            })
+        else:
+            self._send_json(404, {'error': f"Unknown path {url.path}"})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(service, host='127.0.0.1', port=8765):
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def serve(service, host='127.0.0.1', port=8765):
+    """Answer queries until interrupted, refreshing the cache in the background."""
+    server = make_server(service, host, port)
+    service.start()
+    print(f"Serving on http://{host}:{server.server_port}/results?from=STATION&to=STATION")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
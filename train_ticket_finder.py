@@ -1,17 +1,24 @@
-import json
+import os
 import sys
 
-import requests
-from bs4 import BeautifulSoup
-import re
 import argparse
-import os
-import tempfile
-import shutil
-import urllib.parse
-from datetime import datetime
+import threading
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 import util_functions
-from trip_classes import Trip, Trips, Results, TripType, TripJSONEncoder, trip_json_decoder
+from cache_policy import CachePolicy
+from cache_store import CacheStore, default_cache_path
+from http_client import FetchError, HttpClient
+from http_replay import RecordingSession, ReplaySession
+from instrumentation import NULL_PROFILER, Profiler
+from rate_limiter import RateLimiter
+from single_flight import SingleFlight
+from page_store import PageStore
+from price_history import PriceHistory
+from result_parser import PAGE_PARSERS, count_calling_points, service_key
+from trip_classes import DateResult, Trip, Results, TripType
+from trip_combiner import TripCombiner, pareto_frontier
 import calendar
 
 class TooFarInAdvanceException(Exception):
@@ -19,14 +26,32 @@ class TooFarInAdvanceException(Exception):
     pass
 
 
+def _hh_mm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
 class TrainTicketFinder:
     def __init__(self, in_date, no_changes=True, station_from='warrington+bank+quay', station_to='london+euston',
-                 disable_cache=False, max_stops=4, debug_trips=False):
+                 disable_cache=False, max_stops=4, debug_trips=False, workers=1, rate_limit=0.0, cache_policy=None,
+                 parser='soup', session=None, shared_from=None, executor=None, weekdays=(1, 2), max_nights=1,
+                 top_k=2, profiler=None, outbound_window=None, return_window=None, window_step=180, timeout=30.0,
+                 max_retries=3, months=1, page_store=None, cache_path=None, history=None, offline=False,
+                 date_to=None, quiet=False, refresh_ahead=0):
         self.no_changes = no_changes
+        self.station_from = station_from
+        self.station_to = station_to
         self.disable_cache = disable_cache
         self.base_url = "https://traintimes.org.uk"
         self.url_outbound = f'https://traintimes.org.uk/{station_from}/{station_to}/10:30a'
         self.url_return = f'https://traintimes.org.uk/{station_to}/{station_from}/22:00a'
+        # (start, end) departure windows in minutes after midnight, instead of the fixed pages above
+        self.windows = {TripType.OUTBOUND: outbound_window, TripType.RETURN: return_window}
+        # minutes between the pages requested in parallel to cover a window
+        self.window_step = window_step
+        if outbound_window:
+            self.url_outbound = f'https://traintimes.org.uk/{station_from}/{station_to}/{_hh_mm(outbound_window[0])}'
+        if return_window:
+            self.url_return = f'https://traintimes.org.uk/{station_to}/{station_from}/{_hh_mm(return_window[0])}'
         self.scheme = "https"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36',
@@ -38,55 +63,90 @@ class TrainTicketFinder:
             "Upgrade-Insecure-Requests": "1"
         }
 
-        self.cache_file = 'train_prices_cache.json'
-        self.cache = self.load_cache()
+        # shared by every run and process, see default_cache_path for where it lives
+        self.cache_file = cache_path or default_cache_path()
+        self.legacy_cache_file = 'train_prices_cache.json'
+        self.cache_policy = cache_policy or CachePolicy()
+        self.profiler = profiler or (shared_from.profiler if shared_from is not None else NULL_PROFILER)
+        self._state_lock = threading.Lock()
         self.max_stops = max_stops
-        try:
-            self.session = requests.Session()
-            # First visit the main page to get cookies
-            # this is needed to avoid the 418 I'm a teapot error
-            self.session.get(self.base_url)
-        except:
-            print("Failed to connect to traintimes.org")
-            raise
+        self.workers = max(1, workers)
+        # a finder searching another route can share its session, cache, rate limit and in-flight requests
+        if shared_from is not None:
+            self.cache = shared_from.cache
+            self.rate_limiter = shared_from.rate_limiter
+            self.in_flight = shared_from.in_flight
+            self.http = shared_from.http
+        else:
+            self.cache = self.load_cache()
+            self.rate_limiter = RateLimiter(rate_limit)
+            self.in_flight = SingleFlight()
+            self.http = None
+        # raw responses are kept here when given, so the trip cache can be rebuilt by reparse.py
+        self.page_store = page_store if shared_from is None else shared_from.page_store
+        # every fare fetched is also appended here when given, for price_queries
+        self.history = history if shared_from is None else shared_from.history
+        # when given, date pairs are scheduled on this executor instead of a pool owned by the finder
+        self.executor = executor
+        # 'soup' builds a full BeautifulSoup tree, 'fast' only extracts the results with lxml/XPath
+        self.page_parser = PAGE_PARSERS[parser]
+        # earliest date found to be too far in advance, later dates are not fetched
+        self._too_far_date = None
+        if self.http is None:
+            # pooled connections, timeouts and retries, with as many requests in flight as the site allows.
+            # A RecordingSession or ReplaySession can be passed in to record or replay the site, otherwise the
+            # session is only opened and primed with the site's cookies by the first request the cache can't
+            # answer, and never when offline
+            self.http = HttpClient(session, self.base_url, self.headers, self.rate_limiter, self.profiler,
+                                   concurrency=self.workers, timeout=(min(5.0, timeout), timeout),
+                                   max_retries=max_retries, offline=offline)
 
         # Create date pairs for analysis
-        last_day = calendar.monthrange(in_date.year, in_date.month)[1]
-        date_to = datetime(in_date.year, in_date.month, last_day if in_date.day == 1 else in_date.day)
-        self.date_pairs = util_functions.create_date_pairs(in_date, date_to)
+        if date_to is not None:
+            # an explicit range, as asked by ticket_service.py
+            date_to = datetime(date_to.year, date_to.month, date_to.day)
+        elif months > 1:
+            # up to the end of the last month of the scan
+            year, month = divmod(in_date.year * 12 + in_date.month - 1 + months - 1, 12)
+            date_to = datetime(year, month + 1, calendar.monthrange(year, month + 1)[1])
+        else:
+            last_day = calendar.monthrange(in_date.year, in_date.month)[1]
+            date_to = datetime(in_date.year, in_date.month, last_day if in_date.day == 1 else in_date.day)
+        # a scan of several months finds the last bookable date first, instead of running into it
+        self.find_horizon = months > 1 or (date_to.year, date_to.month) != (in_date.year, in_date.month)
+        self.date_pairs = util_functions.create_date_pairs(in_date, date_to, weekdays, max_nights)
+        # number of cheapest outbound and return trips of each date kept to build combinations
+        self.top_k = top_k
         self.debug_trips = debug_trips
+        # no line printed per trip, for the service answering queries
+        self.quiet = quiet
+        # seconds: fares expiring sooner than this are fetched again, so they are refreshed before they expire
+        self.refresh_ahead = refresh_ahead
 
-    def load_cache(self):
-        """Load cache from a JSON file."""
-        if self.disable_cache:
-            return {}
+    @property
+    def session(self):
+        return self.http.session
 
-        if os.path.exists(self.cache_file):
-            with open(self.cache_file, 'r') as file:
-                return json.load(file, object_hook=trip_json_decoder)
-        return {}
+    def load_cache(self):
+        """Open the persistent cache, importing the legacy JSON cache on first use and evicting stale entries."""
+        with self.profiler.stage('cache.load'):
+            cache = CacheStore(self.cache_file, read_enabled=not self.disable_cache, policy=self.cache_policy)
+            migrated = cache.migrate_from_json(self.legacy_cache_file)
+            if migrated:
+                print(f"Migrated {migrated} entries from {self.legacy_cache_file} to {self.cache_file}")
+            # drop past dates, expired prices and the least recently used entries above the size limit
+            cache.evict()
+        return cache
 
     def save_cache(self):
-        """Save cache to a JSON file."""
-        # Read existing data
+        """Flush pending cache writes to disk."""
+        with self.profiler.stage('cache.save'):
+            self.cache.commit()
 
-        try:
-            with open(self.cache_file, 'r') as file:
-                existing_cache = json.load(file, object_hook=trip_json_decoder)
-                existing_cache.update(self.cache)
-        except FileNotFoundError:
-            existing_cache = self.cache
-
-        # Write to temporary file first
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        try:
-            with open(temp_file.name, 'w') as file:
-                json.dump(existing_cache, file, cls=TripJSONEncoder)
-            # Replace original with new file
-            shutil.move(temp_file.name, self.cache_file)
-        except:
-            os.unlink(temp_file.name)
-            raise
+    def _cache_put(self, key, value):
+        """Store a single value in the cache and persist it, safe to call from worker threads."""
+        self.cache[key] = value
+        self.save_cache()
 
     @staticmethod
     def save_html_to_file(html_content, file_name="soup_output.html"):
@@ -95,225 +155,493 @@ class TrainTicketFinder:
             file.write(html_content)
 
     def get_number_of_stops(self, url):
-        try:
-            cache_key = f"stops_{url}"
+        """Number of calling points of a train, raises FetchError when they can't be fetched."""
+        cache_key = f"stops_{url}"
 
-            # Check if the data is in the cache
-            if cache_key in self.cache:
-                return self.cache[cache_key]
-
-            # Then make your actual request
-            response = self.session.get(url, headers=self.headers)
+        # Check if the data is in the cache
+        num_stops = self.cache.get(cache_key)
+        if num_stops is not None:
+            self.profiler.count('cache_hit.stops')
+            return num_stops
+        self.profiler.count('cache_miss.stops')
+
+        # dates and routes fetched concurrently often share calling points, only one of them fetches it
+        return self.in_flight.do(cache_key, self._fetch_number_of_stops, url, cache_key)
+
+    def _fetch_number_of_stops(self, url, cache_key):
+        # another caller, or another process, may have fetched it while we were waiting
+        num_stops = self.cache.reload(cache_key)
+        if num_stops is not None:
+            return num_stops
+
+        # Then make your actual request
+        response = self._request('GET', url)
+
+        if response.status_code != 200:
+            raise FetchError(f"Error fetching stops: {response.status_code}")
+        if self.page_store is not None:
+            self.page_store.put('GET', url, response.status_code, response.text, 'calling')
+
+        with self.profiler.stage('parse.calling_points'):
+            num_stops = count_calling_points(response.text)
+        if num_stops is None:
+            raise FetchError(f"Error fetching stops: no calling points in {url}")
 
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                # Look for table rows in the calling points table, excluding header row
-                stop_rows = soup.find('tbody')
-                # Count rows, ignoring header row(s)
-                num_stops = stop_rows.find_all('tr')
-                # Save the fetched data to the cache
+        # Save the fetched data to the cache
+        self._cache_put(cache_key, num_stops)
 
-                self.cache[cache_key] = len(num_stops)
-                self.save_cache()
+        return num_stops
 
-                return len(num_stops)
-            else:
-                raise Exception(f"Error fetching stops: {response.status_code}")
-        except Exception as e:
-            print(f"Error fetching stops: {e}")
-            return 0
+    def _request(self, method, url):
+        """Send a request through the shared client, respecting the per-host rate limit and retrying throttling."""
+        return self.http.request(method, url)
 
-    def _get_soup_from_url(self, url):
+    def _get_html_from_url(self, url):
         # Make POST request
-        response = self.session.post(url, headers=self.headers)
+        response = self._request('POST', url)
 
         if response.status_code != 200 and response.status_code != 422:
-            print(f"Failed to fetch data for {url}: Status code {response.status_code}")
-            return []
+            raise FetchError(f"Failed to fetch data for {url}: Status code {response.status_code}")
+        if self.page_store is not None:
+            self.page_store.put('POST', url, response.status_code, response.text, 'results')
 
         if self.debug_trips:
             # Save the raw HTML content to a file
             self.save_html_to_file(response.text, "soup_output.html")
 
+        return response.text
 
-        # Parse HTML
-        soup = BeautifulSoup(response.text, 'lxml')
-        return soup
+    def _get_page_from_url(self, url):
+        """Fetch a results page and parse it with the configured page parser."""
+        html_text = self._get_html_from_url(url)
+        with self.profiler.stage('parse.results_page'):
+            return self.page_parser.from_html(html_text, self.base_url, self.no_changes, self.debug_trips)
 
-    def _get_trips_from_soup(self, soup, trip_type, date_str) -> [Trip]:
-        trips: [Trip] = []
+    def _get_stop_counts(self, stops_urls) -> dict:
+        """Resolve the number of stops for each distinct calling points url, in parallel."""
+        unique_urls = list(dict.fromkeys(url for url in stops_urls if url))
 
-        if soup.find('div', id='warning'):
-            return trips
+        if self.workers == 1 or len(unique_urls) < 2:
+            return {url: self._get_number_of_stops_or_none(url) for url in unique_urls}
 
-        result_elements = soup.find_all('li', id=re.compile(r'^result\d+$'))
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(unique_urls))) as executor:
+            return dict(zip(unique_urls, executor.map(self._get_number_of_stops_or_none, unique_urls)))
 
-        for result in result_elements:
+    def _get_number_of_stops_or_none(self, url):
+        """Number of stops of a train, None when its calling points can't be fetched."""
+        try:
+            return self.get_number_of_stops(url)
+        except FetchError as exc:
+            # only this train is dropped, the others of its date are still good
+            print(f"Dropping the train of {url}: {exc}")
+            return None
+
+    def _route_of(self, trip_type):
+        """(origin, destination) of a trip type."""
+        if trip_type == TripType.OUTBOUND:
+            return self.station_from, self.station_to
+        return self.station_to, self.station_from
+
+    def _service_key(self, trip, trip_date):
+        """Cache key of the timetabled service a trip runs on, the same train on another week shares it."""
+        return service_key(trip, trip_date, *self._route_of(trip.type))
+
+    def _get_candidate_stop_counts(self, candidates, trip_date) -> dict:
+        """Number of stops per calling points url, from the service index when the service was seen before."""
+        stop_counts = {}
+        to_fetch = {}
+        for trip, stops_url, _ in candidates:
+            if not stops_url or stops_url in stop_counts or stops_url in to_fetch:
+                continue
+            key = self._service_key(trip, trip_date)
+            num_stops = self.cache.get(key) if key else None
+            if num_stops is not None:
+                self.profiler.count('cache_hit.service')
+                stop_counts[stops_url] = num_stops
+            else:
+                self.profiler.count('cache_miss.service')
+                to_fetch[stops_url] = key
+
+        fetched = self._get_stop_counts(to_fetch)
+        for stops_url, key in to_fetch.items():
+            stop_counts[stops_url] = fetched[stops_url]
+            if key and fetched[stops_url] is not None:
+                self._cache_put(key, fetched[stops_url])
+        return stop_counts
+
+    def _resolve_trip_candidates(self, candidates, stop_counts, date_str) -> [Trip]:
+        """Fill in the number of stops for a batch of candidates and drop the trains with too many stops."""
+        trips: [Trip] = []
 
-            if self.debug_trips:
-                # Print the HTML of each found element
-                print(f"Result {result.get('id')}:\n{result.prettify()}\n")
+        for trip, stops_url, has_price in candidates:
+            num_stops = stop_counts[stops_url] if stops_url else 0
 
-            if result.find('a', class_='change_link') and self.no_changes:
+            # Skip this train if its calling points couldn't be fetched, or it has too many stops
+            if num_stops is None or num_stops > self.max_stops:
                 continue
 
-            trip = Trip(
-                type=trip_type,
-                cost=0.0,  # will be updated later
-                travel_time_str="",  # will be updated later
-                departure_arrival="",
-                travel_time_minutes=0,  # will be updated later
-                date=date_str.strftime("%B %d, %Y"),  # format: May 25, 2025
-                num_stops=0
-            )
-
-            # Find the calling points link
-            calling_link = result.find('a', class_="calling_link")
-            num_stops = 0
-            if calling_link:
-                # Get the href attribute and construct the full URL
-                href = calling_link.get('href')
-                stops_url = urllib.parse.urljoin(self.base_url, href)
-
-                # Get the number of stops
-                num_stops = self.get_number_of_stops(stops_url)
-
-                # Skip this train if it has too many stops
-                if num_stops > self.max_stops:
-                    continue
-
             trip.num_stops = num_stops
 
-            # Extract the time
-            time_element = result.find('strong')
-            trip.departure_arrival = time_element.get_text().strip() if time_element else "Unknown"
-
-            small_element = result.find('small')
-            text = small_element.get_text()
-            # Use regex to find the journey time pattern (e.g., "2h 3m")
-            journey_time_match = re.search(r'(\d+h\s+\d+m)', result.small.get_text())
-            if journey_time_match:
-                journey_time = journey_time_match.group(1)
-                hours, minutes = 0, 0
-                if 'h' in journey_time:
-                    hours = int(re.search(r'(\d+)h', journey_time).group(1))
-                if 'm' in journey_time:
-                    minutes = int(re.search(r'(\d+)m', journey_time).group(1))
-
-                trip.travel_time_minutes = hours * 60 + minutes
-                trip.travel_time_str = journey_time
-            else:
-                print("Journey time not found")
-
-            # Look for Advance Single price pattern
-            match = re.search(r'£(\d+\.\d+) Advance Single', text)
-            if match:
-                trip.cost = float(match.group(1))
-            else:
-                match = re.search(r'£(\d+\.\d+) Single', text)
-                if match:
-                    trip.cost = float(match.group(1))
-                else:
-                    raise TooFarInAdvanceException(f"Date {date_str} is too far in advance, there's no price yet.")
+            if not has_price:
+                raise TooFarInAdvanceException(f"Date {date_str} is too far in advance, there's no price yet.")
 
-            print(trip.to_string(self.debug_trips))
+            if not self.quiet:
+                print(trip.to_string(self.debug_trips))
             trips.append(trip)
 
         return trips
 
+    def _fare_cache_key(self, trip_date, url, trip_type):
+        cache_key = f"{trip_date.strftime('%Y-%m-%d')}_{url}"
+        window = self.windows[trip_type]
+        # the url holds the start of a window, its end is part of the key too
+        return f"{cache_key}-{_hh_mm(window[1])}" if window else cache_key
+
     def _fetch_train_prices(self, trip_date, url, trip_type) -> [Trip]:
         """Fetch train prices for the given date."""
-        date_str = trip_date.strftime("%Y-%m-%d")
-        cache_key = f"{date_str}_{url}"
+        cache_key = self._fare_cache_key(trip_date, url, trip_type)
 
         # Check if the data is in the cache
-        if cache_key in self.cache:
-            trips = self.cache[cache_key]
-            for trip in trips: print(trip.to_string(self.debug_trips))
+        trips = self.cache.get(cache_key, fresh_for=self.refresh_ahead)
+        if trips is not None:
+            self.profiler.count('cache_hit.fares')
+            if not self.quiet:
+                for trip in trips: print(trip.to_string(self.debug_trips))
             return trips
+        self.profiler.count('cache_miss.fares')
 
-        trips: [Trip] = []
+        return self.in_flight.do(cache_key, self._fetch_uncached_train_prices, trip_date, url, trip_type, cache_key)
+
+    def _fetch_uncached_train_prices(self, trip_date, url, trip_type, cache_key) -> [Trip]:
+        # another process sharing the cache may have fetched it since it was looked up
+        trips = self.cache.reload(cache_key, fresh_for=self.refresh_ahead)
+        if trips is not None:
+            return trips
+
+        # Collect the candidates of every page first, so calling points are fetched as one batch
+        page_urls = []
+        if self.windows[trip_type]:
+            candidates = self._get_window_candidates(trip_date, trip_type, self.windows[trip_type], page_urls)
+        else:
+            candidates = self._get_fixed_page_candidates(trip_date, url, trip_type, page_urls)
+
+        # overlapping pages list the same train more than once
+        candidates = list({trip: (trip, stops_url, has_price) for trip, stops_url, has_price in candidates}.values())
+        stop_counts = self._get_candidate_stop_counts(candidates, trip_date)
+        trips = self._resolve_trip_candidates(candidates, stop_counts, trip_date)
+        if self.history is not None:
+            self.history.append(*self._route_of(trip_type), trips)
+
+        # a page missing a train is fetched again next time, rather than cached without it
+        if None in stop_counts.values():
+            return trips
+
+        # Save the fetched data to the cache
+        self._cache_put(cache_key, trips)
+        if self.page_store is not None:
+            self.page_store.link_fare(cache_key, trip_type.name, trip_date, *self._route_of(trip_type),
+                                      self.windows[trip_type], page_urls)
+
+        return trips
+
+    def _get_page_candidates(self, page_url, trip_type, trip_date, page_urls):
+        """Fetch one results page, returns (candidates, later page url)."""
+        page = self._get_page_from_url(page_url)
+        page_urls.append(page_url)
+
+        # let's check this date is too far in advance
+        if page.is_too_far():
+            raise TooFarInAdvanceException(f"Date {trip_date.strftime('%Y-%m-%d')} is too far in advance.")
 
-        url_request = url + f'/{date_str}'
-        soup = self._get_soup_from_url(url_request)
+        with self.profiler.stage('parse.trip_candidates'):
+            candidates = page.trip_candidates(trip_type, trip_date)
+        later_link = page.link('out-later')
+        return candidates, self.base_url + later_link if later_link else None
+
+    def _get_fixed_page_candidates(self, trip_date, url, trip_type, page_urls):
+        """The fixed time page plus its earlier (outbound) or later (return) page."""
+        page_urls.append(url + f"/{trip_date.strftime('%Y-%m-%d')}")
+        page = self._get_page_from_url(page_urls[-1])
 
         # let's check this date is too far in advance
-        if soup.find('p', class_='error-message'):
-            raise TooFarInAdvanceException(f"Date {date_str} is too far in advance.")
+        if page.is_too_far():
+            raise TooFarInAdvanceException(f"Date {trip_date.strftime('%Y-%m-%d')} is too far in advance.")
 
-        # Find all small elements that might contain fare information
-        # Find the result element
-        trips += self._get_trips_from_soup(soup, trip_type, trip_date)
+        with self.profiler.stage('parse.trip_candidates'):
+            candidates = page.trip_candidates(trip_type, trip_date)
 
         if trip_type == TripType.OUTBOUND:
-            earlier_later_link = soup.find('a', {'data-type': 'out-earlier'})['href']
+            earlier_later_link = page.link('out-earlier')
         else:
-            earlier_later_link = soup.find('a', {'data-type': 'out-later'})['href']
+            earlier_later_link = page.link('out-later')
 
+        # the link is missing on some pages, there's nothing more to fetch then
         if earlier_later_link:
-            soup = self._get_soup_from_url(self.base_url + earlier_later_link)
-            trips += self._get_trips_from_soup(soup, trip_type, trip_date)
+            page_urls.append(self.base_url + earlier_later_link)
+            page = self._get_page_from_url(page_urls[-1])
+            with self.profiler.stage('parse.trip_candidates'):
+                candidates += page.trip_candidates(trip_type, trip_date)
+
+        return candidates
+
+    def _walk_window_segment(self, page_url, segment_end, trip_type, trip_date, page_urls, max_pages=6):
+        """Follow the later links from page_url until a departure at or after segment_end is listed."""
+        candidates = []
+        latest_departure = -1
+        for _ in range(max_pages):
+            page_candidates, later_url = self._get_page_candidates(page_url, trip_type, trip_date, page_urls)
+            departures = [trip.departure_minutes for trip, _, _ in page_candidates if trip.departure_minutes >= 0]
+
+            # past midnight the times start again from 00:00, those trains belong to the next day
+            if departures and min(departures) < latest_departure - 12 * 60:
+                candidates += [candidate for candidate in page_candidates
+                               if candidate[0].departure_minutes >= latest_departure - 12 * 60]
+                break
 
-        # Save the fetched data to the cache
-        self.cache[cache_key] = trips
-        self.save_cache()
+            candidates += page_candidates
+            latest_departure = max(departures + [latest_departure])
+            if latest_departure >= segment_end or not later_url:
+                break
+            page_url = later_url
+        return candidates
 
-        return trips
+    def _get_window_candidates(self, trip_date, trip_type, window, page_urls):
+        """Candidates departing within the window, its pages are requested in parallel.
 
-    def fetch_trip_data(self) -> Results:
+        The window is split every window_step minutes, the page of each split is fetched at once and the later
+        links of a page are only followed until the next split is reached, so the window is covered with the
+        fewest requests.
+        """
+        start, end = window
+        if trip_type == TripType.OUTBOUND:
+            route_url = f"{self.base_url}/{self.station_from}/{self.station_to}"
+        else:
+            route_url = f"{self.base_url}/{self.station_to}/{self.station_from}"
+        date_str = trip_date.strftime('%Y-%m-%d')
 
-        trip_results: Results = Results(
-            same_day_tuesday=[],
-            same_day_wednesday=[],
-            overnight_stays=[]
-        )
+        anchors = list(range(start, end, max(1, self.window_step))) or [start]
+        segments = [(f"{route_url}/{_hh_mm(anchor)}/{date_str}", segment_end)
+                    for anchor, segment_end in zip(anchors, anchors[1:] + [end])]
 
-        for date1, date2 in self.date_pairs:
-            # Get the month key for this pair
-            # Same day returns (both Tuesday and Wednesday)
-            is_tuesday = date1.weekday() == date2.weekday() == 1
-            is_overnight = date1.weekday() == 1 and date2.weekday() == 2
-            try:
-                if is_overnight:
-                    continue
-                else:
-                    outbound_trip = self._fetch_train_prices(date1, self.url_outbound, TripType.OUTBOUND)
-                    return_trip = self._fetch_train_prices(date2, self.url_return, TripType.RETURN)
-            except TooFarInAdvanceException as too_far_exc:
-                print(too_far_exc)
-                break
+        if self.workers == 1 or len(segments) == 1:
+            segment_candidates = [self._walk_window_segment(url, segment_end, trip_type, trip_date, page_urls)
+                                  for url, segment_end in segments]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(segments))) as executor:
+                segment_candidates = list(executor.map(
+                    lambda segment: self._walk_window_segment(segment[0], segment[1], trip_type, trip_date,
+                                                              page_urls),
+                    segments))
+
+        return [candidate for candidates in segment_candidates for candidate in candidates
+                if start <= candidate[0].departure_minutes <= end]
+
+    def _horizon_cache_key(self):
+        return f"horizon_{self.station_from}_{self.station_to}"
+
+    def _is_bookable(self, trip_date):
+        """Probe the outbound page of a date, it is bookable when it's not too far ahead and every train has a price."""
+        self.profiler.count('horizon.probes')
+        page = self._get_page_from_url(f"{self.url_outbound}/{trip_date.strftime('%Y-%m-%d')}")
+        if page.is_too_far():
+            return False
+        return all(has_price for _, _, has_price in page.trip_candidates(TripType.OUTBOUND, trip_date))
+
+    def find_booking_horizon(self, dates):
+        """Return the last bookable date of the sorted dates, None if none of them is.
+
+        Bookable dates all come before the ones too far in advance, so a binary search finds the boundary with
+        log2(len(dates)) probes. The boundary is cached for the route, what is known narrows the next search.
+        """
+        cache_key = self._horizon_cache_key()
+        known = self.cache.get(cache_key) or {}
+        last_bookable = date.fromisoformat(known['last_bookable']) if known.get('last_bookable') else None
+        first_too_far = date.fromisoformat(known['first_too_far']) if known.get('first_too_far') else None
+
+        # dates up to low are bookable, dates from high on are too far in advance
+        low = bisect_right(dates, last_bookable) - 1 if last_bookable else -1
+        high = bisect_left(dates, first_too_far) if first_too_far else len(dates)
+        if low >= high:
+            # the horizon moved since it was cached
+            low, high, last_bookable, first_too_far = -1, len(dates), None, None
+
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._is_bookable(dates[middle]):
+                low = middle
+                last_bookable = max(dates[middle], last_bookable or dates[middle])
+            else:
+                high = middle
+                first_too_far = min(dates[middle], first_too_far or dates[middle])
 
-            if not outbound_trip or not return_trip:
-                continue
+        bounds = {
+            'last_bookable': last_bookable.isoformat() if last_bookable else None,
+            'first_too_far': first_too_far.isoformat() if first_too_far else None,
+        }
+        # only what a probe found is stored, rewriting the cached bounds would keep them from ever expiring
+        if bounds != {name: known.get(name) for name in bounds}:
+            self._cache_put(cache_key, bounds)
+        return dates[low] if low >= 0 else None
 
-            # take only the first two from min_outbound and min_return
-            min_outbound = sorted(outbound_trip, key=lambda x: (x.cost, x.travel_time_minutes))[:2]
-            min_return = sorted(return_trip, key=lambda x: (x.cost, x.travel_time_minutes))[:2]
+    def _bookable_date_pairs(self):
+        """The date pairs to fetch, without the ones past the booking horizon when it is looked for."""
+        if not self.find_horizon or not self.date_pairs:
+            return self.date_pairs
 
-            # Create Trips objects for the selected trips
-            trips = [Trips(outbound=out, return_trip=ret) for out in min_outbound for ret in min_return]
-            trips = sorted(trips, key=lambda x: (x.cost()))[:2]
+        dates = sorted({day for pair in self.date_pairs for day in pair})
+        try:
+            horizon = self.find_booking_horizon(dates)
+        except FetchError as fetch_exc:
+            # the dates too far in advance are still found the slow way
+            print(f"Failed to find the booking horizon: {fetch_exc}")
+            return self.date_pairs
+
+        if horizon is None:
+            print(f"No date is bookable yet, the first is {dates[0].strftime('%Y-%m-%d')}")
+            return []
+        print(f"Bookable up to {horizon.strftime('%Y-%m-%d')}")
+        return [(date1, date2) for date1, date2 in self.date_pairs if date2 <= horizon]
 
-            if is_tuesday:
-                trip_results.same_day_tuesday.extend(trips)
-            else:
-                trip_results.same_day_wednesday.extend(trips)
+    def _fetch_date_pair(self, date1, date2):
+        """Fetch outbound and return trips for a single date pair."""
+        too_far_date = self._too_far_date
+        if too_far_date is not None and date1 >= too_far_date:
+            raise TooFarInAdvanceException(f"Date {date1} is too far in advance.")
 
-        # extract overnight stays from Tuesday and Wednesday already calculated
-        for date1, date2 in self.date_pairs:
-            is_overnight = date1.weekday() == 1 and date2.weekday() == 2
-            if not is_overnight:
-                continue
+        try:
+            outbound_trip = self._fetch_train_prices(date1, self.url_outbound, TripType.OUTBOUND)
+            return_trip = self._fetch_train_prices(date2, self.url_return, TripType.RETURN)
+        except TooFarInAdvanceException:
+            with self._state_lock:
+                if self._too_far_date is None or date1 < self._too_far_date:
+                    self._too_far_date = date1
+            raise
 
-            date1 = date1.strftime("%B %d, %Y")
-            date2 = date2.strftime("%B %d, %Y")
+        return outbound_trip, return_trip
 
-            outbound = {trips.outbound for trips in trip_results.same_day_tuesday if trips.outbound.date == date1}
-            return_trip = {trips.return_trip for trips in trip_results.same_day_wednesday if
-                           trips.return_trip.date == date2}
-            trips = [Trips(outbound=out, return_trip=ret) for out in outbound for ret in return_trip]
-            trips = sorted(trips, key=lambda x: (x.cost()))[:2]
-            trip_results.overnight_stays.extend(trips)
+    def _fetch_date_pairs(self, date_pairs):
+        """Yield (date1, date2, (outbound, return)) in order, stopping at the first date too far in advance."""
+        self._too_far_date = None
+
+        if self.workers == 1 and self.executor is None:
+            for date1, date2 in date_pairs:
+                try:
+                    yield date1, date2, self._fetch_date_pair(date1, date2)
+                except TooFarInAdvanceException as too_far_exc:
+                    print(too_far_exc)
+                    return
+                except FetchError as fetch_exc:
+                    print(f"Skipping {date1.strftime('%Y-%m-%d')}: {fetch_exc}")
+            return
+
+        if self.executor is not None:
+            yield from self._collect_date_pairs(self.executor, date_pairs)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from self._collect_date_pairs(executor, date_pairs)
+
+    def _collect_date_pairs(self, executor, date_pairs):
+        futures = [executor.submit(self._fetch_date_pair, date1, date2) for date1, date2 in date_pairs]
+        try:
+            for (date1, date2), future in zip(date_pairs, futures):
+                try:
+                    yield date1, date2, future.result()
+                except TooFarInAdvanceException as too_far_exc:
+                    print(too_far_exc)
+                    return
+                except FetchError as fetch_exc:
+                    # a failed date is left out, the dates after it are still worth having
+                    print(f"Skipping {date1.strftime('%Y-%m-%d')}: {fetch_exc}")
+        finally:
+            # stop the dates nobody is going to read, either too far in advance or after an early cut-off
+            for pending in futures:
+                pending.cancel()
+
+    @staticmethod
+    def _result_kind(outbound_date, return_date):
+        """Name of the Results list a combination leaving and coming back on these dates belongs to."""
+        nights = (return_date - outbound_date).days
+        if nights == 0:
+            return {1: 'same_day_tuesday', 2: 'same_day_wednesday'}.get(outbound_date.weekday(), 'same_day_other')
+        return 'overnight_stays' if nights == 1 else 'longer_stays'
+
+    def iter_trip_data(self, max_cost=None):
+        """Yield a DateResult as soon as each date pair is done, in date order.
+
+        Same day results come first, a stay follows as soon as the day it comes back on is known.
+        With ``max_cost`` the scan stops after the first result whose cheapest option costs no more than that.
+        """
+        bookable_pairs = self._bookable_date_pairs()
+        # stays are built from the trips of the same day results below
+        same_day_pairs = [(date1, date2) for date1, date2 in bookable_pairs if date1 == date2]
+        stays_by_return_date = {}
+        for date1, date2 in bookable_pairs:
+            if date1 != date2:
+                stays_by_return_date.setdefault(date2, []).append(date1)
+
+        # decode all the fare pages of this run with a single indexed lookup
+        self.cache.prefetch([self._fare_cache_key(date1, self.url_outbound, TripType.OUTBOUND)
+                             for date1, _ in same_day_pairs] +
+                            [self._fare_cache_key(date2, self.url_return, TripType.RETURN)
+                             for _, date2 in same_day_pairs])
+
+        combiner = TripCombiner(self.top_k)
+        date_pairs = self._fetch_date_pairs(same_day_pairs)
+        try:
+            for date1, date2, (outbound_trip, return_trip) in date_pairs:
+                combiner.add_date(date1, outbound_trip, return_trip)
+                date_results = []
+
+                trips = combiner.combine(date1, date2)
+                if trips:
+                    date_results.append(DateResult(date1, date2, outbound_trip, return_trip, trips,
+                                                   self._result_kind(date1, date2),
+                                                   pareto_frontier(outbound_trip), pareto_frontier(return_trip)))
+
+                # every stay coming back today can now be combined with the day it left on
+                for outbound_date in stays_by_return_date.get(date2, []):
+                    if not combiner.has_date(outbound_date):
+                        continue
+                    trips = combiner.combine(outbound_date, date2)
+                    if trips:
+                        date_results.append(DateResult(outbound_date, date2, combiner.outbound_by_date[outbound_date],
+                                                       combiner.return_by_date[date2], trips,
+                                                       self._result_kind(outbound_date, date2)))
+
+                for date_result in date_results:
+                    yield date_result
+                    if max_cost is not None and date_result.best[0].cost() <= max_cost:
+                        print(f"Found an option for £{date_result.best[0].cost():.2f}, stopping the scan")
+                        return
+        finally:
+            date_pairs.close()
+            if self.history is not None:
+                self.history.flush()
+
+    def iter_fares(self):
+        """Yield (date, outbound trips, return trips) of every bookable date searched, in date order."""
+        same_day_pairs = [(date1, date2) for date1, date2 in self._bookable_date_pairs() if date1 == date2]
+        date_pairs = self._fetch_date_pairs(same_day_pairs)
+        try:
+            for date1, _, (outbound_trip, return_trip) in date_pairs:
+                yield date1, outbound_trip, return_trip
+        finally:
+            date_pairs.close()
+            if self.history is not None:
+                self.history.flush()
+
+    def fetch_trip_data(self, max_cost=None) -> Results:
+
+        trip_results: Results = Results(
+            same_day_tuesday=[],
+            same_day_wednesday=[],
+            overnight_stays=[]
+        )
+
+        with self.profiler.stage('fetch_trip_data'):
+            for date_result in self.iter_trip_data(max_cost):
+                getattr(trip_results, date_result.kind).extend(date_result.best)
         return trip_results
 
 
@@ -325,11 +653,44 @@ if __name__ == "__main__":
               '\t--year YEAR       Starting year (2025)\n'
               '\nOptional arguments:\n'
               '\t--day DAY         Day of the month (1-31, default: 1)\n'
+              '\t--months MONTHS   Number of months to scan, up to the booking horizon (default: 1)\n'
               '\t--station_from    Starting station, use + for spaces (default: warrington+bank+quay)\n'
               '\t--station_to      Final station, use + for spaces (default: london+euston)\n'
               '\t--max_stops       Maximum stops for a train journey (default: 8)\n'
+              '\t--weekdays        Comma separated weekdays to travel on (default: tue,wed)\n'
+              '\t--max_nights      Longest stay combined from two travel days (default: 1)\n'
+              '\t--outbound_window Outbound departures to cover, e.g. 06:00-12:00\n'
+              '\t--return_window   Return departures to cover, e.g. 16:00-22:00\n'
+              '\t--window_step     Minutes between the pages of a window requested in parallel (default: 180)\n'
+              '\t--max_cost        Stop the scan once a return trip costs no more than this\n'
+              '\t--stream          Print the best options found so far after every date\n'
+              '\t--routes          Search several routes at once, FROM:TO[:YYYY-MM[..YYYY-MM]]\n'
+              '\t--routes_file     File with one route per line, same format as --routes\n'
+              '\t--workers         Number of dates fetched concurrently (default: 1)\n'
+              '\t--rate_limit      Maximum requests per second to the site (default: unlimited)\n'
+              '\t--timeout         Seconds to wait for a response before retrying (default: 30)\n'
+              '\t--retries         Retries of a throttled or failed request, with backoff (default: 3)\n'
+              '\t--parser          Results page parser: soup or fast (default: soup)\n'
               '\t--nocache         Disable caching of results\n'
-              '\t--debug_trips     Enable verbose debug output',
+              '\t--offline         Answer from the cache only, without connecting to the site\n'
+              '\t--cache_path FILE Cache file shared by concurrent runs (default: ~/.cache/ticketfinder)\n'
+              '\t--debug_trips     Enable verbose debug output\n'
+              '\t--profile [FILE]  Print a timing report, also written as JSON to FILE if given\n'
+              '\t--record DIR      Record every response as a fixture in DIR\n'
+              '\t--replay DIR      Replay recorded fixtures instead of hitting the site\n'
+              '\t--history DIR     Price history directory (default: history next to the cache file)\n'
+              '\t--nohistory       Do not record the fares fetched in the history\n'
+              '\t--history_report  Print fare statistics from the price history\n'
+              '\t--store_pages DIR Keep every page fetched, compressed, in DIR\n'
+              '\t--reparse DIR     Rebuild the trip cache from the pages stored in DIR\n'
+              '\t--watch DAYS      Report fare changes over the next DAYS days as JSON lines\n'
+              '\t--watch_interval  Minutes between polls of the watch, 0 for a single poll (default: 0)\n'
+              '\t--watch_output    File the watch events are appended to (default: stdout)\n'
+              '\t--serve [PORT]    Answer queries over HTTP/JSON from a warm cache (default port: 8765)\n'
+              '\t--host HOST       Address the service listens on (default: 127.0.0.1)\n'
+              '\t--refresh_days    Days ahead the service keeps fresh in the background (default: 14)\n'
+              '\t--refresh_interval Seconds between background refreshes, 0 to disable (default: 900)\n'
+              '\t--replay_latency  Seconds of simulated latency per replayed request (default: 0)',
         formatter_class=util_functions.CustomFormatter,
         epilog='Example: %(prog)s --month 6 --year 2025 --station_from "manchester+piccadilly"',
         add_help=True
@@ -339,6 +700,8 @@ if __name__ == "__main__":
     group.add_argument('--month', type=int, help='Starting month (1-12)', metavar='MONTH')
     group.add_argument('--year', type=int, help='Starting year', metavar='YEAR')
     group.add_argument('--day', type=int, help='Day of the month (1-31)', default=1, metavar='DAY')
+    group.add_argument('--months', type=int, default=1, metavar='MONTHS',
+                       help='Number of months to scan, only the dates up to the booking horizon are fetched')
 
     group = parser.add_argument_group('search options')
     group.add_argument('--station_from', type=str, help='Starting station (use + for spaces)',
@@ -348,27 +711,200 @@ if __name__ == "__main__":
 
     group.add_argument('--max_stops', type=int, help='Maximum stops for a train journey', default=8, metavar='STOPS')
     group.add_argument('--no_changes', action='store_true', help='Only show direct trains', default=True)
+    group.add_argument('--weekdays', type=util_functions.parse_weekdays, default=(1, 2), metavar='DAYS',
+                       help='Comma separated weekdays to travel on (default: tue,wed)')
+    group.add_argument('--max_nights', type=int, default=1, metavar='NIGHTS',
+                       help='Longest stay combined from two travel days (default: 1)')
+    group.add_argument('--outbound_window', type=util_functions.parse_time_window, metavar='HH:MM-HH:MM',
+                       help='Outbound departures to cover, instead of the pages around 10:30')
+    group.add_argument('--return_window', type=util_functions.parse_time_window, metavar='HH:MM-HH:MM',
+                       help='Return departures to cover, instead of the pages around 22:00')
+    group.add_argument('--window_step', type=int, default=180, metavar='MINUTES',
+                       help='Minutes between the pages of a window requested in parallel (default: 180)')
+    group.add_argument('--max_cost', type=float, help='Stop the scan once a return trip costs no more than this',
+                       metavar='COST')
+    group.add_argument('--stream', action='store_true', help='Print the best options found so far after every date')
+    group.add_argument('--routes', nargs='+', help='Search several routes at once, FROM:TO[:YYYY-MM[..YYYY-MM]]',
+                       metavar='ROUTE')
+    group.add_argument('--routes_file', type=str, help='File with one route per line, same format as --routes',
+                       metavar='FILE')
+
+    group = parser.add_argument_group('performance options')
+    group.add_argument('--workers', type=int, help='Number of dates fetched concurrently', default=1,
+                       metavar='WORKERS')
+    group.add_argument('--rate_limit', type=float, help='Maximum requests per second to the site (0 = unlimited)',
+                       default=0.0, metavar='RPS')
+    group.add_argument('--timeout', type=float, default=30.0, metavar='SECONDS',
+                       help='Seconds to wait for a response before retrying (default: 30)')
+    group.add_argument('--retries', type=int, default=3, metavar='RETRIES',
+                       help='Retries of a throttled or failed request, with backoff (default: 3)')
+    group.add_argument('--parser', choices=sorted(PAGE_PARSERS), default='soup',
+                       help='Results page parser, fast skips building a BeautifulSoup tree')
 
     group = parser.add_argument_group('debug options')
     group.add_argument('--nocache', action='store_true', help='Disable caching of results')
+    group.add_argument('--offline', action='store_true',
+                       help='Answer from the cache only, dates that are not cached are skipped')
+    group.add_argument('--cache_path', type=str, metavar='FILE',
+                       help='Cache file, shared by concurrent runs (default: $TICKETFINDER_CACHE_DIR or '
+                            '~/.cache/ticketfinder/train_prices_cache.sqlite3)')
     group.add_argument('--debug_trips', action='store_true', help='Enable verbose debug output')
+    group.add_argument('--profile', nargs='?', const='', metavar='FILE',
+                       help='Print where the run spent its time, and write the report as JSON to FILE if given')
+    group.add_argument('--record', type=str, help='Record every response as a fixture in DIR', metavar='DIR')
+    group.add_argument('--replay', type=str, help='Replay the fixtures recorded in DIR instead of hitting the site',
+                       metavar='DIR')
+    group.add_argument('--history', type=str, metavar='DIR',
+                       help='Price history directory (default: history next to the cache file)')
+    group.add_argument('--nohistory', action='store_true', help='Do not record the fares fetched in the history')
+    group.add_argument('--history_report', action='store_true',
+                       help='Print cheapest fares by weekday, by days before travel and percentiles from the history')
+    group.add_argument('--store_pages', type=str, help='Keep every page fetched, compressed, in DIR',
+                       metavar='DIR')
+    group.add_argument('--reparse', type=str, metavar='DIR',
+                       help='Rebuild the trip cache from the pages stored in DIR, without hitting the site')
+    group.add_argument('--replay_latency', type=float, help='Seconds of simulated latency per replayed request',
+                       default=0.0, metavar='SECONDS')
+
+    group = parser.add_argument_group('service options')
+    group.add_argument('--serve', nargs='?', type=int, const=8765, metavar='PORT',
+                       help='Answer GET /results?from=..&to=..&start=..&end=.. as JSON from a warm cache')
+    group.add_argument('--host', type=str, default='127.0.0.1', metavar='HOST',
+                       help='Address the service listens on (default: 127.0.0.1)')
+    group.add_argument('--refresh_days', type=int, default=14, metavar='DAYS',
+                       help='Days ahead the service keeps fresh in the background (default: 14)')
+    group.add_argument('--refresh_interval', type=float, default=900, metavar='SECONDS',
+                       help='Seconds between background refreshes, 0 to disable (default: 900)')
+
+    group = parser.add_argument_group('watch options')
+    group.add_argument('--watch', type=int, metavar='DAYS',
+                       help='Fetch the fares of the next DAYS days again and print what changed as JSON lines')
+    group.add_argument('--watch_interval', type=float, default=0, metavar='MINUTES',
+                       help='Minutes between polls of the watch, 0 for a single poll (default: 0)')
+    group.add_argument('--watch_output', type=str, metavar='FILE',
+                       help='File the watch events are appended to (default: stdout)')
     args = parser.parse_args()
+    if args.stream and (args.routes or args.routes_file):
+        parser.error("--stream can't be combined with --routes or --routes_file")
+    if args.reparse:
+        from reparse import reparse_pages
+
+        cache = CacheStore(args.cache_path or default_cache_path(), policy=CachePolicy())
+        rebuilt, skipped = reparse_pages(PageStore(args.reparse), cache, args.max_stops, args.no_changes, args.parser)
+        cache.close()
+        print(f"Rebuilt {rebuilt} fare entries from {args.reparse}, skipped {skipped} with missing pages or prices")
+        sys.exit(0)
+
+    history_dir = args.history or os.path.join(os.path.dirname(args.cache_path or default_cache_path()), 'history')
+    if args.history_report:
+        util_functions.print_history_report(PriceHistory(history_dir))
+        sys.exit(0)
+
+    session = None
+    if args.replay:
+        session = ReplaySession(args.replay, args.replay_latency)
+    elif args.record:
+        session = RecordingSession(args.record)
+    history = PriceHistory(history_dir) if not args.nohistory else None
+    profiler = Profiler() if args.profile is not None else None
+
+    if args.watch is not None:
+        import contextlib
+        import json
+        import time
+        from fare_watch import FareWatch
+        from route_matrix import parse_route
+
+        routes = [parse_route(spec, datetime.now()) for spec in args.routes or []]
+        watch = FareWatch([(route.station_from, route.station_to) for route in routes] or
+                          [(args.station_from, args.station_to)], args.watch, workers=args.workers,
+                          rate_limit=args.rate_limit, session=session, no_changes=args.no_changes,
+                          max_stops=args.max_stops, parser=args.parser, weekdays=args.weekdays,
+                          profiler=profiler, outbound_window=args.outbound_window,
+                          return_window=args.return_window, window_step=args.window_step, timeout=args.timeout,
+                          max_retries=args.retries,
+                          page_store=PageStore(args.store_pages) if args.store_pages else None,
+                          cache_path=args.cache_path, history=history, offline=args.offline)
+        output = open(args.watch_output, 'a') if args.watch_output else sys.stdout
+        try:
+            while True:
+                # progress goes to stderr, so only the events are written to stdout
+                with contextlib.redirect_stdout(sys.stderr):
+                    events = watch.poll()
+                for event in events:
+                    output.write(json.dumps(event) + '\n')
+                output.flush()
+                if args.watch_interval <= 0:
+                    break
+                time.sleep(args.watch_interval * 60)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watch.close()
+            if output is not sys.stdout:
+                output.close()
+        util_functions.print_profile(profiler, args.profile)
+        sys.exit(0)
+
+    if args.serve is not None:
+        from route_matrix import parse_route
+        from ticket_service import TicketService, serve
+
+        routes = [parse_route(spec, datetime.now()) for spec in args.routes or []]
+        service = TicketService(args.workers, args.rate_limit, session,
+                                [(route.station_from, route.station_to) for route in routes],
+                                args.refresh_days, args.refresh_interval, no_changes=args.no_changes,
+                                disable_cache=args.nocache, max_stops=args.max_stops, parser=args.parser,
+                                weekdays=args.weekdays, max_nights=args.max_nights, profiler=profiler,
+                                outbound_window=args.outbound_window, return_window=args.return_window,
+                                window_step=args.window_step, timeout=args.timeout, max_retries=args.retries,
+                                page_store=PageStore(args.store_pages) if args.store_pages else None,
+                                cache_path=args.cache_path, history=history, offline=args.offline)
+        serve(service, args.host, args.serve)
+        util_functions.print_profile(profiler, args.profile)
+        sys.exit(0)
+
     if args.month is None or args.year is None:
         parser.print_help()
         sys.exit(1)
 
-    scraper = TrainTicketFinder( datetime(args.year, args.month, args.day) ,args.no_changes, args.station_from, args.station_to, args.nocache, args.max_stops, args.debug_trips)
-
-    results = scraper.fetch_trip_data()
-
-    # min_fares = scraper.calculate_min_fares(results)
-    best_tuesdays = sorted(results.same_day_tuesday, key=lambda trip: trip.cost())
-    best_wednesdays = sorted(results.same_day_wednesday, key=lambda trip: trip.cost())
-
-    # let's keep only the best wednesday that cost less than the best tuesday
-    #if best_tuesdays and best_wednesdays:
-    #best_wednesdays = [trip for trip in best_wednesdays if trip.cost() < best_tuesdays[0].cost()]
-
-    best_overnight = sorted(results.overnight_stays, key=lambda trip: trip.cost())
-    util_functions.print_trip_results(best_tuesdays[:1], best_wednesdays[:1], best_overnight[:1], args.debug_trips)
-    util_functions.print_trip_results(best_tuesdays[1:], best_wednesdays[1:], best_overnight[1:], args.debug_trips)
\ No newline at end of file
+    in_date = datetime(args.year, args.month, args.day)
+
+    if args.routes or args.routes_file:
+        from route_matrix import RouteMatrix, parse_route
+
+        specs = list(args.routes or [])
+        if args.routes_file:
+            with open(args.routes_file, 'r') as routes_file:
+                specs += [line.strip() for line in routes_file if line.strip() and not line.startswith('#')]
+
+        matrix = RouteMatrix([parse_route(spec, in_date) for spec in specs], args.workers, args.rate_limit,
+                             args.no_changes, args.nocache, args.max_stops, args.debug_trips, args.parser, session,
+                             args.weekdays, args.max_nights, profiler, args.cache_path, history, args.offline,
+                             args.outbound_window, args.return_window, args.window_step, args.timeout,
+                             args.retries, PageStore(args.store_pages) if args.store_pages else None)
+        for route_name, route_results in matrix.search(args.max_cost).items():
+            print(f"\n##### {route_name} #####")
+            util_functions.print_best_results(route_results, args.debug_trips)
+        util_functions.print_profile(profiler, args.profile)
+        sys.exit(0)
+
+    scraper = TrainTicketFinder(in_date, args.no_changes, args.station_from, args.station_to, args.nocache, args.max_stops, args.debug_trips,
+                                 args.workers, args.rate_limit, parser=args.parser,
+                                 session=session, weekdays=args.weekdays, max_nights=args.max_nights,
+                                 profiler=profiler, outbound_window=args.outbound_window,
+                                 return_window=args.return_window, window_step=args.window_step,
+                                 timeout=args.timeout, max_retries=args.retries, months=args.months,
+                                 page_store=PageStore(args.store_pages) if args.store_pages else None,
+                                 cache_path=args.cache_path, history=history, offline=args.offline)
+
+    if args.stream:
+        results = Results(same_day_tuesday=[], same_day_wednesday=[], overnight_stays=[])
+        for date_result in scraper.iter_trip_data(args.max_cost):
+            getattr(results, date_result.kind).extend(date_result.best)
+            print(f"\n----- Best so far, after {date_result.outbound_date} - {date_result.return_date} -----")
+            util_functions.print_best_results(results, args.debug_trips, best_only=True)
+    else:
+        results = scraper.fetch_trip_data(args.max_cost)
+    util_functions.print_best_results(results, args.debug_trips)
+    util_functions.print_profile(profiler, args.profile)
@@ -1,5 +1,7 @@
 import datetime
+import re
 from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import List, Dict, Optional
 from enum import Enum
 
@@ -7,33 +9,111 @@ class TripType(Enum):
     OUTBOUND = 1
     RETURN = 2
 
-@dataclass
+_TRIP_DATE_FORMAT = "%B %d, %Y"  # format: May 25, 2025
+_TIMES_PATTERN = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+
+
+@lru_cache(maxsize=4096)
+def _date_to_ordinal(date_text: str) -> int:
+    return datetime.datetime.strptime(date_text, _TRIP_DATE_FORMAT).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _ordinal_to_date(ordinal: int) -> str:
+    return datetime.date.fromordinal(ordinal).strftime(_TRIP_DATE_FORMAT)
+
+
+def _times_to_minutes(departure_arrival: str):
+    """Departure and arrival as minutes after midnight, -1 when they can't be read."""
+    times = _TIMES_PATTERN.findall(departure_arrival)
+    if len(times) < 2:
+        return -1, -1
+    (departure_hours, departure_minutes), (arrival_hours, arrival_minutes) = times[0], times[-1]
+    return int(departure_hours) * 60 + int(departure_minutes), int(arrival_hours) * 60 + int(arrival_minutes)
+
+
 class Trip:
-    type: TripType
-    cost: float = float("inf")
-    departure_arrival: str = ""
-    travel_time_str: str = ""
-    travel_time_minutes: int = 0
-    date: str = ""
-    num_stops: int = 0
+    """A single train journey.
+
+    The date is stored as an ordinal and the departure and arrival as minutes after midnight, the formatted
+    ``date`` and the free text ``departure_arrival`` are kept for display. The hash is computed once and
+    reset whenever a field changes.
+    """
+    __slots__ = ('type', 'cost', '_departure_arrival', 'travel_time_str', 'travel_time_minutes', 'date_ordinal',
+                 'num_stops', 'departure_minutes', 'arrival_minutes', '_hash')
+
+    def __init__(self, type: TripType, cost: float = float("inf"), departure_arrival: str = "",
+                 travel_time_str: str = "", travel_time_minutes: int = 0, date="", num_stops: int = 0):
+        self.type = type
+        self.cost = cost
+        self.departure_arrival = departure_arrival
+        self.travel_time_str = travel_time_str
+        self.travel_time_minutes = travel_time_minutes
+        self.date = date
+        self.num_stops = num_stops
+
+    @classmethod
+    def from_fields(cls, type, cost, departure_arrival, travel_time_str, travel_time_minutes, date_ordinal,
+                    num_stops, departure_minutes, arrival_minutes):
+        """Build a trip from already parsed fields, used by the binary cache codec."""
+        trip = object.__new__(cls)
+        for name, value in (('type', type), ('cost', cost), ('_departure_arrival', departure_arrival),
+                            ('travel_time_str', travel_time_str), ('travel_time_minutes', travel_time_minutes),
+                            ('date_ordinal', date_ordinal), ('num_stops', num_stops),
+                            ('departure_minutes', departure_minutes), ('arrival_minutes', arrival_minutes),
+                            ('_hash', None)):
+            object.__setattr__(trip, name, value)
+        return trip
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_hash', None)
+
+    @property
+    def date(self) -> str:
+        return _ordinal_to_date(self.date_ordinal) if self.date_ordinal else ""
+
+    @date.setter
+    def date(self, value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            self.date_ordinal = value.toordinal()
+        else:
+            self.date_ordinal = _date_to_ordinal(value) if value else 0
+
+    @property
+    def departure_arrival(self) -> str:
+        return self._departure_arrival
+
+    @departure_arrival.setter
+    def departure_arrival(self, value: str):
+        self._departure_arrival = value
+        self.departure_minutes, self.arrival_minutes = _times_to_minutes(value)
 
     def to_string(self, debug_trip=False) -> str:
         trip_type = 'Outbound' if self.type == TripType.OUTBOUND else 'Return'
         debug_hash = f" {hash(self)}" if debug_trip else ""
         return f"{trip_type} £{self.cost:.2f} {self.date} - {self.departure_arrival}: {self.travel_time_str} - {self.num_stops} stops {debug_hash}"
 
+    def __repr__(self):
+        return (f"Trip(type={self.type}, cost={self.cost!r}, departure_arrival={self.departure_arrival!r}, "
+                f"travel_time_str={self.travel_time_str!r}, travel_time_minutes={self.travel_time_minutes!r}, "
+                f"date={self.date!r}, num_stops={self.num_stops!r})")
+
     def __eq__(self, other):
         if isinstance(other, Trip):
             return (self.type == other.type and self.cost == other.cost and
                     self.travel_time_str == other.travel_time_str and
                     self.departure_arrival == other.departure_arrival and
                     self.travel_time_minutes == other.travel_time_minutes and
-                    self.date == other.date and self.num_stops == other.num_stops)
+                    self.date_ordinal == other.date_ordinal and self.num_stops == other.num_stops)
         return False
 
     def __hash__(self):
-        return hash((self.type, self.cost, self.travel_time_str, self.departure_arrival,
-                     self.travel_time_minutes, self.date, self.num_stops))
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash((self.type, self.cost, self.travel_time_str,
+                                                    self._departure_arrival, self.travel_time_minutes,
+                                                    self.date_ordinal, self.num_stops)))
+        return self._hash
 
 @dataclass
 class Trips:
@@ -46,7 +126,27 @@ class Trips:
 class Results:
     same_day_tuesday: List[Trips]
     same_day_wednesday: List[Trips]
+    # stays of one night, Tuesday to Wednesday unless other weekdays are searched
     overnight_stays: List[Trips]
+    # same day returns on any other weekday searched
+    same_day_other: List[Trips] = field(default_factory=list)
+    # stays of two nights or more
+    longer_stays: List[Trips] = field(default_factory=list)
+
+@dataclass
+class DateResult:
+    """Trips found for one date pair, streamed by TrainTicketFinder.iter_trip_data."""
+    outbound_date: datetime.date
+    return_date: datetime.date
+    outbound: List[Trip]
+    return_trips: List[Trip]
+    # cheapest combinations, at most two
+    best: List[Trips]
+    # name of the Results list the best combinations belong to
+    kind: str
+    # outbound and return trips not beaten on cost, travel time and stops at once, same day results only
+    outbound_frontier: List[Trip] = field(default_factory=list)
+    return_frontier: List[Trip] = field(default_factory=list)
 
 from json import JSONEncoder
 from datetime import date
@@ -0,0 +1,63 @@
+import struct
+from typing import List
+
+from trip_classes import Trip, TripType
+
+MAGIC = b'TRP1'
+
+# count prefixes
+_COUNT = struct.Struct('<I')
+_STRING_LENGTH = struct.Struct('<H')
+# type, cost, travel time, date ordinal, stops, departure, arrival, departure_arrival and travel_time_str indexes
+_TRIP = struct.Struct('<BdHIHhhII')
+
+
+def is_trip_list(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(trip, Trip) for trip in value)
+
+
+def encode_trips(trips: List[Trip]) -> bytes:
+    """Pack a list of trips into a compact binary record, repeated strings are only stored once."""
+    strings = {}
+    packed_trips = []
+    for trip in trips:
+        departure_arrival = strings.setdefault(trip.departure_arrival, len(strings))
+        travel_time_str = strings.setdefault(trip.travel_time_str, len(strings))
+        packed_trips.append(_TRIP.pack(trip.type.value, trip.cost, trip.travel_time_minutes, trip.date_ordinal,
+                                       trip.num_stops, trip.departure_minutes, trip.arrival_minutes,
+                                       departure_arrival, travel_time_str))
+
+    parts = [MAGIC, _COUNT.pack(len(strings))]
+    for text in strings:
+        encoded = text.encode('utf-8')
+        parts.append(_STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    parts.append(_COUNT.pack(len(packed_trips)))
+    parts.extend(packed_trips)
+    return b''.join(parts)
+
+
+def decode_trips(data: bytes) -> List[Trip]:
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not an encoded trip list")
+
+    offset = len(MAGIC)
+    (string_count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    strings = []
+    for _ in range(string_count):
+        (length,) = _STRING_LENGTH.unpack_from(data, offset)
+        offset += _STRING_LENGTH.size
+        strings.append(data[offset:offset + length].decode('utf-8'))
+        offset += length
+
+    (trip_count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    trip_types = {trip_type.value: trip_type for trip_type in TripType}
+    trips = []
+    for (trip_type, cost, travel_time_minutes, date_ordinal, num_stops, departure_minutes, arrival_minutes,
+         departure_arrival, travel_time_str) in _TRIP.iter_unpack(data[offset:offset + trip_count * _TRIP.size]):
+        trips.append(Trip.from_fields(trip_types[trip_type], cost, strings[departure_arrival],
+                                      strings[travel_time_str], travel_time_minutes, date_ordinal, num_stops,
+                                      departure_minutes, arrival_minutes))
+    return trips
@@ -0,0 +1,75 @@
+import heapq
+from typing import Callable, List
+
+from trip_classes import Trip, Trips
+
+
+def trip_sort_key(trip: Trip):
+    """Cheapest first, the quickest of equally priced trips first."""
+    return trip.cost, trip.travel_time_minutes
+
+
+def top_k(trips: List[Trip], k: int, key: Callable = trip_sort_key) -> List[Trip]:
+    """The k best trips in O(n log k), ties keep their original order like a stable sort would."""
+    return heapq.nsmallest(k, trips, key=key)
+
+
+def pareto_frontier(trips: List[Trip]) -> List[Trip]:
+    """Trips not beaten on cost, travel time and number of stops at the same time by any other trip."""
+    frontier: List[Trip] = []
+    for trip in sorted(trips, key=lambda t: (t.cost, t.travel_time_minutes, t.num_stops)):
+        # sorted by cost, so only a trip already on the frontier can dominate this one
+        dominated = any(kept.travel_time_minutes <= trip.travel_time_minutes and kept.num_stops <= trip.num_stops
+                        for kept in frontier)
+        if not dominated:
+            frontier.append(trip)
+    return frontier
+
+
+def best_combinations(outbound: List[Trip], return_trips: List[Trip], k: int) -> List[Trips]:
+    """The k cheapest outbound/return combinations without building the whole cross product.
+
+    Both lists are expected sorted cheapest first (as returned by top_k), the k cheapest sums are then
+    walked with a heap in O(k log k).
+    """
+    if not outbound or not return_trips or k <= 0:
+        return []
+
+    combinations: List[Trips] = []
+    heap = [(outbound[0].cost + return_trips[0].cost, 0, 0)]
+    seen = {(0, 0)}
+    while heap and len(combinations) < k:
+        _, i, j = heapq.heappop(heap)
+        combinations.append(Trips(outbound=outbound[i], return_trip=return_trips[j]))
+        for next_i, next_j in ((i, j + 1), (i + 1, j)):
+            if next_i < len(outbound) and next_j < len(return_trips) and (next_i, next_j) not in seen:
+                seen.add((next_i, next_j))
+                heapq.heappush(heap, (outbound[next_i].cost + return_trips[next_j].cost, next_i, next_j))
+    return combinations
+
+
+class TripCombiner:
+    """Keeps the best outbound and return trips of every date and combines them into return journeys.
+
+    Same day returns and stays of any number of nights are built from the same per date top-k lists, so a
+    stay costs O(k log k) whatever the number of trains on each day.
+    """
+
+    def __init__(self, k=2, combinations=2):
+        self.k = k
+        self.combinations = combinations
+        self.outbound_by_date = {}
+        self.return_by_date = {}
+
+    def add_date(self, trip_date, outbound: List[Trip], return_trips: List[Trip]):
+        # the same train can be listed twice by overlapping pages, it would take two of the k places
+        self.outbound_by_date[trip_date] = top_k(list(dict.fromkeys(outbound)), self.k)
+        self.return_by_date[trip_date] = top_k(list(dict.fromkeys(return_trips)), self.k)
+
+    def has_date(self, trip_date):
+        return trip_date in self.outbound_by_date
+
+    def combine(self, outbound_date, return_date) -> List[Trips]:
+        """Cheapest combinations leaving on outbound_date and coming back on return_date."""
+        return best_combinations(self.outbound_by_date.get(outbound_date, []),
+                                 self.return_by_date.get(return_date, []), self.combinations)
@@ -16,7 +16,7 @@ class CustomFormatter(argparse.HelpFormatter):
 
 
 def print_trip_results(best_tuesdays: List[Trips], best_wednesdays: List[Trips], best_overnight: List[Trips],
-                       debug_hashes=False):
+                       debug_hashes=False, best_other_days: List[Trips] = (), best_longer_stays: List[Trips] = ()):
     def print_trip_section(title: str, trips: List[Trips]):
         if not trips:
             return
@@ -37,46 +37,122 @@ def print_trip_results(best_tuesdays: List[Trips], best_wednesdays: List[Trips],
                        best_tuesdays)
     print_trip_section(f"{'Best' if len(best_wednesdays) == 1 else 'Other Options'} Wednesday Same-Day Trips",
                        best_wednesdays)
+    print_trip_section(f"{'Best' if len(best_other_days) == 1 else 'Other Options'} Other Days Same-Day Trips",
+                       best_other_days)
     print_trip_section(f"{'Best' if len(best_overnight) == 1 else 'Other Options'} Overnight Trips", best_overnight)
-
-
-def create_date_pairs(date_from: datetime, date_to: datetime) -> list[tuple]:
-    """Create pairs of dates for analysis."""
-    # Get all Tuesdays and Wednesdays
+    print_trip_section(f"{'Best' if len(best_longer_stays) == 1 else 'Other Options'} Longer Stays",
+                       best_longer_stays)
+
+
+def print_best_results(results, debug_hashes=False, best_only=False):
+    """Print the best option of each kind followed by the other options, unless best_only is set."""
+    best = {name: sorted(getattr(results, name), key=lambda trip: trip.cost())
+            for name in ('same_day_tuesday', 'same_day_wednesday', 'overnight_stays', 'same_day_other',
+                         'longer_stays')}
+    print_trip_results(best['same_day_tuesday'][:1], best['same_day_wednesday'][:1], best['overnight_stays'][:1],
+                       debug_hashes, best['same_day_other'][:1], best['longer_stays'][:1])
+    if not best_only:
+        print_trip_results(best['same_day_tuesday'][1:], best['same_day_wednesday'][1:], best['overnight_stays'][1:],
+                           debug_hashes, best['same_day_other'][1:], best['longer_stays'][1:])
+
+
+def print_profile(profiler, json_path=None):
+    """Print the profiler's report table, and write it as JSON when a path is given."""
+    if profiler is None:
+        return
+    print("\n=== Profile ===")
+    print(profiler.format_table())
+    if json_path:
+        profiler.write_json(json_path)
+        print(f"Profile written to {json_path}")
+
+
+def print_history_report(history):
+    """Print when fares were cheapest, per route of the price history."""
+    import price_queries
+
+    routes, columns = history.load()
+    if not routes:
+        print(f"No fares recorded in {history.directory} yet")
+        return
+    for route in routes:
+        route_columns = price_queries.select(routes, columns, route)
+        print(f"\n=== {route}: {len(route_columns['cost'])} fares observed ===")
+        print("Cheapest by weekday: " + ", ".join(f"{weekday} £{cost:.2f}" for weekday, cost
+                                                  in price_queries.cheapest_by_weekday(route_columns).items()))
+        print("Percentiles: " + ", ".join(f"p{percentile} £{cost:.2f}" for percentile, cost
+                                          in price_queries.fare_percentiles(route_columns).items()))
+        print("Days before travel   fares     mean  cheapest")
+        for days_before, count, mean, cheapest in price_queries.price_by_days_before(route_columns):
+            print(f"{days_before:>18}  {count:>6}  {f'£{mean:.2f}':>7}  {f'£{cheapest:.2f}':>8}")
+
+
+def parse_time_window(text: str) -> tuple:
+    """Parse "06:00-12:00" into (360, 720), minutes after midnight."""
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M") for part in text.split('-'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid time window '{text}', use HH:MM-HH:MM")
+    start, end = start.hour * 60 + start.minute, end.hour * 60 + end.minute
+    if end < start:
+        raise argparse.ArgumentTypeError(f"Invalid time window '{text}', it ends before it starts")
+    return start, end
+
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+def parse_weekdays(text: str) -> tuple:
+    """Parse a comma separated list of weekday names (tue,wed) into weekday numbers (1, 2)."""
+    try:
+        return tuple(sorted({WEEKDAY_NAMES.index(name.strip().lower()[:3]) for name in text.split(',') if name.strip()}))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid weekdays '{text}', use names like tue,wed")
+
+
+def create_date_pairs(date_from: datetime, date_to: datetime, weekdays=(1, 2), max_nights=1) -> list[tuple]:
+    """Create pairs of dates for analysis.
+
+    Every date on one of the weekdays gives a same day pair, followed by a pair for each stay of up to
+    max_nights nights that comes back on another of the weekdays.
+    """
     # Check date is not in the past
     now = datetime.now()
-    dates = _get_tuesdays_wednesdays(date_from, date_to)
+    dates = _get_weekdays(date_from, date_to, weekdays)
+    searched_dates = set(dates)
     pairs = []
-    for i in range(len(dates)):
+    for date in dates:
         # Same day pair
-        if dates[i] < now.date():
+        if date < now.date():
             continue
 
-        pairs.append((dates[i], dates[i]))
-        # Check if there's a next date that forms a Tuesday-Wednesday pair
-        if i + 1 < len(dates) and dates[i].weekday() == 1 and dates[i + 1].weekday() == 2 and (
-                dates[i + 1] - dates[i]).days == 1:
-            pairs.append((dates[i], dates[i + 1]))
+        pairs.append((date, date))
+        for nights in range(1, max_nights + 1):
+            return_date = date + timedelta(days=nights)
+            if return_date in searched_dates:
+                pairs.append((date, return_date))
     return pairs
 
 
 def _get_tuesdays_wednesdays(date_from: datetime, date_to: datetime) -> List[datetime]:
     """Get all Tuesdays and Wednesdays of the year starting from the specified month or current date."""
-    # List to store all Tuesdays and Wednesdays
-    tuesdays_wednesdays = []
+    return _get_weekdays(date_from, date_to, (1, 2))
+
+
+def _get_weekdays(date_from: datetime, date_to: datetime, weekdays) -> List[datetime]:
+    """Get all the dates falling on one of the weekdays (0 is Monday) between the two dates."""
+    dates = []
 
     # Start from the first day of the month (or current date if it's later)
     current_date = date_from
 
-    # Loop until the end of the year
     while current_date <= date_to:
-        # Check if the day is Tuesday (1) or Wednesday (2)
-        if current_date.weekday() in [1, 2]:  # 0 is Monday, 1 is Tuesday, 2 is Wednesday
+        if current_date.weekday() in weekdays:
             # Only include dates that are today or in the future
             if current_date.date() >= datetime.today().date():
-                tuesdays_wednesdays.append(current_date.date())
+                dates.append(current_date.date())
 
         # Move to the next day
         current_date += timedelta(days=1)
 
-    return tuesdays_wednesdays
+    return dates